@@ -0,0 +1,204 @@
+"""
+Benchmarks for the capture-and-annotate pipeline in streamlit_app.py.
+
+Serves fixtures/netflix_home.html from a local HTTP server, drives the same
+capture steps as the homepage screenshot against it and times every stage
+separately. Results are written as JSON and compared with a stored baseline.
+
+    python benchmark.py --iterations 5 --output results.json
+    python benchmark.py --save-baseline          # record benchmarks/baseline.json
+    python benchmark.py --baseline benchmarks/baseline.json --threshold 0.2
+
+Browser stages are skipped (and reported as such) when Chrome cannot start.
+"""
+import argparse
+import base64
+import contextlib
+import functools
+import http.server
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import threading
+import time
+
+from PIL import Image
+
+import streamlit_app as app
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+FIXTURE_PAGE = "netflix_home.html"
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "baseline.json")
+
+# Stages timed for every browser capture, in pipeline order
+BROWSER_STAGES = ["driver_startup", "navigation", "wait", "screenshot", "annotate", "encode",
+                  "export_base64", "export_zip"]
+
+# Request handler that serves the fixture directory without logging every request
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+# Function to serve the fixture directory on a free local port
+@contextlib.contextmanager
+def serve_fixture(directory=FIXTURE_DIR):
+    handler = functools.partial(QuietHandler, directory=directory)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/{FIXTURE_PAGE}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+# Function to time a callable, returning (result, seconds)
+def timed(func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+# Function to reduce a list of samples to summary statistics in milliseconds
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "mean_ms": round(1000 * statistics.fmean(ordered), 3),
+        "p50_ms": round(1000 * ordered[len(ordered) // 2], 3),
+        "p95_ms": round(1000 * ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+        "min_ms": round(1000 * ordered[0], 3),
+    }
+
+# Function to run one full capture against the fixture, timing each stage
+def capture_once(url, timings):
+    driver, elapsed = timed(app.start_capture_driver)
+    timings["driver_startup"].append(elapsed)
+    try:
+        # load_page() times the readiness wait itself; the rest is navigation
+        wait, elapsed = timed(app.load_page, driver, url)
+        timings["navigation"].append(elapsed - wait["elapsed"])
+        timings["wait"].append(wait["elapsed"])
+
+        # Uses the configured CAPTURE_BACKEND, like the app
+        (screenshot, profile_name, stamped), elapsed = timed(app.take_screenshot, driver)
+        timings["screenshot"].append(elapsed)
+    finally:
+        driver.quit()
+
+    if stamped:
+        # The CDP backend already stamped and encoded the image in the browser
+        result, elapsed = app.CaptureResult(data=screenshot, profile_name=profile_name), 0.0
+    else:
+        result, elapsed = timed(app.add_timestamp_to_image, screenshot)
+    timings["annotate"].append(elapsed)
+    data, elapsed = timed(lambda: result.data)
+    timings["encode"].append(elapsed)
+    # Cost of the old data-URI download links, kept for comparison
+    _, elapsed = timed(base64.b64encode, data)
+    timings["export_base64"].append(elapsed)
+    _, elapsed = timed(app.build_zip_archive, [(f"netflix_homepage.{result.extension}", data)])
+    timings["export_zip"].append(elapsed)
+
+# Function to benchmark the browser stages, or explain why they were skipped
+def run_browser_benchmarks(iterations):
+    timings = {stage: [] for stage in BROWSER_STAGES}
+    with serve_fixture() as url:
+        try:
+            for _ in range(iterations):
+                capture_once(url, timings)
+        except Exception as e:
+            if not timings["driver_startup"]:
+                return {}, f"browser unavailable: {str(e).splitlines()[0]}"
+            raise
+    return {f"browser.{stage}": summarize(samples) for stage, samples in timings.items()}, None
+
+# Function to benchmark the image paths that do not need a browser
+def run_image_benchmarks(iterations):
+    # A detailed 1920x1080 frame standing in for a real screenshot
+    frame = Image.effect_mandelbrot((1920, 1080), (-2.0, -1.0, 1.0, 1.0), 100).convert("RGBA")
+    frame_bytes = io.BytesIO()
+    frame.save(frame_bytes, format="PNG", compress_level=1)
+    frame_bytes = frame_bytes.getvalue()
+
+    cases = {
+        "image.placeholder": lambda: app.create_placeholder_image().data,
+        "image.login_placeholders": lambda: [result.data for _, result in app.create_login_placeholder_images("someone@example.com")],
+        "image.decode_annotate": lambda: app.add_timestamp_to_image(frame_bytes),
+        "image.annotate_decoded": lambda: app.add_timestamp_to_image(frame.copy()),
+    }
+    for name in app.ENCODER_PROFILES:
+        cases[f"encode.{name}"] = functools.partial(app.encode_image, frame, name)
+
+    results = {}
+    for name, case in cases.items():
+        case()  # Warm font and overlay caches
+        results[name] = summarize([timed(case)[1] for _ in range(iterations)])
+    return results
+
+# Function to compare results with a baseline, returning regressed stages
+def find_regressions(results, baseline, threshold):
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous:
+            continue
+        if current["p50_ms"] > previous["p50_ms"] * (1 + threshold):
+            regressions.append({"stage": name, "baseline_p50_ms": previous["p50_ms"],
+                                "current_p50_ms": current["p50_ms"],
+                                "change": round(current["p50_ms"] / previous["p50_ms"] - 1, 3)})
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=5, help="samples per stage")
+    parser.add_argument("--output", help="write the JSON results here as well as to stdout")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed p50 slowdown before flagging, 0.2 = 20%%")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--skip-browser", action="store_true", help="only run the image microbenchmarks")
+    args = parser.parse_args(argv)
+
+    results = run_image_benchmarks(args.iterations)
+    skipped = "--skip-browser" if args.skip_browser else None
+    if not args.skip_browser:
+        browser_results, skipped = run_browser_benchmarks(args.iterations)
+        results.update(browser_results)
+
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "iterations": args.iterations,
+            "screenshot_format": app.SCREENSHOT_FORMAT,
+            "capture_backend": app.CAPTURE_BACKEND,
+            "wait_strategies": app.CAPTURE_WAIT_STRATEGIES,
+            "browser_skipped": skipped,
+        },
+        "results": results,
+    }
+
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            report["regressions"] = find_regressions(results, json.load(f), args.threshold)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            f.write(output + "\n")
+
+    if report.get("regressions"):
+        print(f"{len(report['regressions'])} stage(s) regressed beyond {args.threshold:.0%}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,278 @@
+"""
+Load test for the homepage capture in streamlit_app.py.
+
+Serves fixtures/netflix_home.html from a local HTTP server, points
+NETFLIX_HOME_URL at it and starts the app with `streamlit run`. N headless
+clients then connect over the app's websocket, each pressing "Capture
+Netflix Homepage" a number of times and following the reruns until the
+result is shown. The sessions share one server, like real users, so they
+share its capture worker, browser pool and caches. Concurrency is ramped
+through --levels. For each level the tool reports throughput, latency
+percentiles, the most Chromium processes seen at once and the peak memory
+of the server's process tree. Failures of the clients themselves are
+counted as client_error and left out of the latencies.
+
+    python load_test.py --levels 1,2,4,8 --requests 3
+    python load_test.py --levels 4 --bypass-cache --output load.json
+
+Runs offline. Without a browser every capture fails fast and is counted as
+failed, which still exercises the worker and polling paths.
+"""
+import argparse
+import contextlib
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+import psutil
+from streamlit.proto import Alert_pb2, BackMsg_pb2, ForwardMsg_pb2, WidgetStates_pb2
+from websockets.sync.client import connect
+
+from benchmark import serve_fixture
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "streamlit_app.py")
+CAPTURE_BUTTON = "Capture Netflix Homepage"
+BYPASS_CHECKBOX = "Bypass capture cache"
+SAMPLE_INTERVAL = 0.2
+SERVER_START_TIMEOUT = 60
+
+# Records the peak browser process count and memory of a process tree
+class ResourceSampler:
+    def __init__(self, process_names, pid):
+        self.process_names = process_names
+        self.pid = pid
+        self.peak_browsers = 0
+        self.peak_rss = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def sample(self):
+        try:
+            process = psutil.Process(self.pid)
+            members = [process] + process.children(recursive=True)
+        except psutil.Error:
+            return
+        browsers, rss = 0, 0
+        for member in members:
+            try:
+                rss += member.memory_info().rss
+                if member.name().startswith(self.process_names):
+                    browsers += 1
+            except psutil.Error:
+                continue
+        self.peak_browsers = max(self.peak_browsers, browsers)
+        self.peak_rss = max(self.peak_rss, rss)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.sample()
+            self._stop.wait(SAMPLE_INTERVAL)
+
+# Function to start the app with `streamlit run` on a free port and wait
+# until it answers, yielding (process, port)
+@contextlib.contextmanager
+def start_app_server():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    server = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", APP_PATH, "--server.headless", "true",
+         "--server.address", "127.0.0.1", "--server.port", str(port), "--browser.gatherUsageStats", "false"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + SERVER_START_TIMEOUT
+        while True:
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1).close()
+                break
+            except OSError:
+                if server.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("The app server did not start")
+                time.sleep(0.2)
+        yield server, port
+    finally:
+        server.terminate()
+        try:
+            server.wait(10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+# One simulated browser tab talking to the app server
+class AppClient:
+    """
+    Speaks the app's websocket protocol the way the browser does: each run
+    sends the widget states and collects the elements the script renders.
+    Reruns the app schedules itself while a capture is pending are followed
+    until a run finishes normally.
+    """
+
+    def __init__(self, websocket, timeout):
+        self.timeout = timeout
+        self.widget_ids = {}  # Label -> ID, learned from the rendered elements
+        self._websocket = websocket
+
+    def run(self, widget_states=()):
+        message = BackMsg_pb2.BackMsg()
+        message.rerun_script.query_string = ""
+        message.rerun_script.widget_states.widgets.extend(widget_states)
+        self._websocket.send(message.SerializeToString())
+        deadline = time.monotonic() + self.timeout
+        elements = []
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"The app did not finish within {self.timeout:.0f}s")
+            forward = ForwardMsg_pb2.ForwardMsg.FromString(self._websocket.recv(timeout=remaining))
+            kind = forward.WhichOneof("type")
+            if kind == "new_session":
+                # Each run, including ones the app triggers with st.rerun, starts afresh
+                elements = []
+            elif kind == "delta" and forward.delta.WhichOneof("type") == "new_element":
+                element = forward.delta.new_element
+                elements.append(element)
+                widget = getattr(element, element.WhichOneof("type"))
+                if hasattr(widget, "id") and hasattr(widget, "label"):
+                    self.widget_ids[widget.label] = widget.id
+            elif kind == "script_finished" and forward.script_finished != ForwardMsg_pb2.ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                return elements
+
+# Function to classify what a capture interaction ended with, from the
+# elements of the run it settled on
+def get_outcome(elements):
+    alerts = [(element.alert.format, element.alert.body) for element in elements if element.WhichOneof("type") == "alert"]
+    if any(element.WhichOneof("type") == "exception" for element in elements):
+        return "exception"
+    if any("busy" in body for _, body in alerts):
+        return "rejected"
+    if any("backend is unavailable" in body for _, body in alerts):
+        return "circuit_open"
+    if any(alert_format == Alert_pb2.Alert.ERROR for alert_format, _ in alerts):
+        return "failed"
+    if any(alert_format == Alert_pb2.Alert.SUCCESS for alert_format, _ in alerts):
+        return "ok"
+    # The run ended without rendering a result at all
+    return "no_result"
+
+# Function to run one simulated user: open the app, then press the capture button repeatedly
+def run_session(port, requests, bypass_cache, timeout, samples):
+    started = time.perf_counter()
+    try:
+        with connect(f"ws://127.0.0.1:{port}/_stcore/stream", subprotocols=["streamlit"],
+                     open_timeout=timeout, max_size=None) as websocket:
+            client = AppClient(websocket, timeout)
+            client.run()
+            for _ in range(requests):
+                started = time.perf_counter()
+                states = [WidgetStates_pb2.WidgetState(id=client.widget_ids[CAPTURE_BUTTON], trigger_value=True)]
+                if bypass_cache:
+                    states.append(WidgetStates_pb2.WidgetState(id=client.widget_ids[BYPASS_CHECKBOX], bool_value=True))
+                samples.append((get_outcome(client.run(states)), time.perf_counter() - started))
+    except Exception as e:
+        # A failure of this client, not of the app; the session cannot go on after it
+        print(f"Session error: {e}", file=sys.stderr)
+        samples.append(("client_error", time.perf_counter() - started))
+
+# Function to pick a percentile from sorted samples
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+# Function to run every session of one concurrency level and summarise it
+def run_level(server, port, concurrency, requests, bypass_cache, timeout, process_names):
+    samples = []
+    sessions = [threading.Thread(target=run_session, args=(port, requests, bypass_cache, timeout, samples))
+                for _ in range(concurrency)]
+    with ResourceSampler(process_names, server.pid) as sampler:
+        started = time.perf_counter()
+        for session in sessions:
+            session.start()
+        for session in sessions:
+            session.join()
+        elapsed = time.perf_counter() - started
+
+    # Client failures say nothing about how fast the app answers
+    latencies = sorted(seconds for outcome, seconds in samples if outcome != "client_error")
+    latency_ms = {"p50": None, "p90": None, "p99": None, "max": None}
+    if latencies:
+        latency_ms = {
+            "p50": round(1000 * percentile(latencies, 0.50), 1),
+            "p90": round(1000 * percentile(latencies, 0.90), 1),
+            "p99": round(1000 * percentile(latencies, 0.99), 1),
+            "max": round(1000 * latencies[-1], 1),
+        }
+    outcomes = {}
+    for outcome, _ in samples:
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    return {
+        "concurrency": concurrency,
+        "requests": len(samples),
+        "outcomes": outcomes,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(outcomes.get("ok", 0) / elapsed, 3),
+        "latency_ms": latency_ms,
+        "peak_browser_processes": sampler.peak_browsers,
+        "peak_rss_mb": round(sampler.peak_rss / 1024 / 1024, 1),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--levels", default="1,2,4,8", help="comma-separated concurrent session counts")
+    parser.add_argument("--requests", type=int, default=3, help="captures per session")
+    parser.add_argument("--bypass-cache", action="store_true", help="tick 'Bypass capture cache' in every session")
+    parser.add_argument("--timeout", type=float, default=180, help="seconds one interaction may take")
+    parser.add_argument("--url", help="page to capture instead of the local fixture")
+    parser.add_argument("--output", help="write the JSON report here as well as to stdout")
+    args = parser.parse_args(argv)
+    levels = [int(level) for level in args.levels.split(",") if level.strip()]
+
+    # Captures left on disk by earlier runs would turn every request into a cache hit.
+    # The server inherits this environment.
+    os.environ["CAPTURE_CACHE_DIR"] = ""
+    import streamlit_app as app
+
+    with serve_fixture() as fixture_url:
+        os.environ["NETFLIX_HOME_URL"] = args.url or fixture_url
+        results = []
+        with start_app_server() as (server, port):
+            for concurrency in levels:
+                result = run_level(server, port, concurrency, args.requests, args.bypass_cache, args.timeout,
+                                   app.BROWSER_PROCESS_NAMES)
+                results.append(result)
+                latency = {name: "n/a" if value is None else f"{value:.0f} ms" for name, value in result["latency_ms"].items()}
+                print(f"{concurrency:>4} sessions: {result['throughput_rps']:.2f} captures/s, "
+                      f"p50 {latency['p50']}, p99 {latency['p99']}, "
+                      f"{result['peak_browser_processes']} browser processes, {result['peak_rss_mb']:.0f} MB peak, "
+                      f"outcomes {result['outcomes']}", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "requests_per_session": args.requests,
+            "bypass_cache": args.bypass_cache,
+            "url": args.url or "fixture",
+            "capture_workers": app.CAPTURE_WORKERS,
+            "browser_pool_size": app.BROWSER_POOL_SIZE,
+        },
+        "levels": results,
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""
+Scheduled homepage captures with change detection.
+
+Captures the homepage every --interval seconds through the same pipeline as
+the app (browser pool, page wait, backend, timestamp and capture cache) and
+fingerprints each frame (difference hash plus mean colour) with the
+timestamp badge blanked out. Only frames that visually differ from the last
+stored one are written to disk; unchanged captures are recorded as
+references to it.
+
+    python monitor.py --interval 300 --output monitor
+    python monitor.py --count 1                      # one capture, then exit
+
+The output directory holds
+    frames/         one file per visual change
+    captures.jsonl  every capture: time, distances and the frame it maps to
+    changes.jsonl   change events only: time, frame, fingerprint and distances
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import streamlit_app as app
+
+DEFAULT_OUTPUT = os.environ.get("MONITOR_DIR", "monitor")
+DEFAULT_INTERVAL = float(os.environ.get("MONITOR_INTERVAL", "300"))
+# Hash bits that may differ before a frame counts as changed; the mean colour
+# is compared against app.COLOR_CHANGE_THRESHOLD as well
+DEFAULT_THRESHOLD = int(os.environ.get("MONITOR_CHANGE_THRESHOLD", "8"))
+
+# Function to append one JSON record to a log file
+def append_record(path, record):
+    with open(path, "a") as f:
+        f.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+# Function to read the last change event, so a restarted monitor keeps comparing against it
+def load_last_change(path):
+    if not os.path.exists(path):
+        return None
+    last = None
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                last = json.loads(line)
+    return last
+
+# Function to capture the homepage once and store it if it changed
+def capture_and_record(output, last_change, threshold):
+    captured_at = time.time()
+    record = {"time": round(captured_at, 3), "timestamp": app.get_indian_datetime()}
+    try:
+        # A fresh capture, which also refreshes the app's capture cache
+        entry, _ = app.run_homepage_capture(bypass_cache=True)
+    except Exception as e:
+        record["error"] = str(e).splitlines()[0]
+        append_record(os.path.join(output, "captures.jsonl"), record)
+        print(f"Capture failed: {record['error']}")
+        return last_change
+
+    result = entry["result"]
+    fingerprint = app.fingerprint_capture(result.image)
+    result.release_image()
+    distance, color_distance = app.fingerprint_distance(fingerprint, last_change) if last_change else (None, None)
+    record.update(fingerprint, distance=distance, color_distance=color_distance, wait=result.metadata.get("wait_condition"))
+
+    if last_change and app.fingerprints_match(fingerprint, last_change, threshold):
+        # Unchanged: point at the frame already on disk
+        record["frame"] = last_change["frame"]
+        append_record(os.path.join(output, "captures.jsonl"), record)
+        print(f"{record['timestamp']}: unchanged (distance {distance}, colour {color_distance})")
+        return last_change
+
+    frame_name = f"{time.strftime('%Y%m%d_%H%M%S', time.localtime(captured_at))}_{int(captured_at * 1000) % 1000:03d}"
+    frame = os.path.join("frames", f"{frame_name}.{result.extension}")
+    with open(os.path.join(output, frame), "wb") as f:
+        f.write(result.data)
+    record["frame"] = frame
+    change = dict(fingerprint, time=record["time"], timestamp=record["timestamp"], frame=frame, distance=distance,
+                  color_distance=color_distance, previous=last_change["frame"] if last_change else None)
+    append_record(os.path.join(output, "changes.jsonl"), change)
+    append_record(os.path.join(output, "captures.jsonl"), record)
+    print(f"{record['timestamp']}: changed (distance {distance}, colour {color_distance}), stored {frame}")
+    return change
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL, help="seconds between captures")
+    parser.add_argument("--count", type=int, default=0, help="stop after this many captures (0 runs forever)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="directory for frames and indexes")
+    parser.add_argument("--threshold", type=int, default=DEFAULT_THRESHOLD,
+                        help=f"differing hash bits (of {app.PERCEPTUAL_HASH_SIZE ** 2}) still treated as unchanged")
+    args = parser.parse_args(argv)
+
+    os.makedirs(os.path.join(args.output, "frames"), exist_ok=True)
+    last_change = load_last_change(os.path.join(args.output, "changes.jsonl"))
+    app.resolve_chromedriver()
+
+    captures = 0
+    next_run = time.monotonic()
+    try:
+        while True:
+            last_change = capture_and_record(args.output, last_change, args.threshold)
+            captures += 1
+            if args.count and captures >= args.count:
+                break
+            # Keep to the schedule; ticks missed during a slow capture are skipped
+            next_run += args.interval
+            now = time.monotonic()
+            if next_run < now:
+                next_run += args.interval * ((now - next_run) // args.interval + 1)
+            time.sleep(next_run - now)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        app.get_browser_pool().close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
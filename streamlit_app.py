@@ -3,123 +3,2218 @@ import time
 import datetime
 import pytz
 import io
+import atexit
+import queue
+import threading
+import uuid
+import collections
+import contextlib
+import concurrent.futures
+import glob
+import hashlib
+import json
+import re
+import base64
+import shutil
+import logging
+import http.client
+import http.server
+import bisect
+import ipaddress
+import select
+import socket
+import urllib.parse
+import psutil
+import tempfile
+import weakref
 import streamlit as st
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
+from selenium.webdriver.common.selenium_manager import SeleniumManager
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from webdriver_manager.chrome import ChromeDriverManager
-from PIL import Image, ImageDraw, ImageFont
-import base64
+from PIL import Image, ImageDraw, ImageFont, TiffImagePlugin
+import zipfile
+
+# Public page captured by the homepage screenshot option
+NETFLIX_HOME_URL = os.environ.get("NETFLIX_HOME_URL", "https://www.netflix.com")
+
+# Browser window size used for every capture
+CAPTURE_WINDOW_SIZE = os.environ.get("CAPTURE_WINDOW_SIZE", "1920,1080")
+
+# Shared capture cache: entries expire after the TTL, the least recently used
+# ones are evicted beyond the byte budget, and CAPTURE_CACHE_DIR (empty to
+# disable) keeps them across reruns and restarts
+CAPTURE_CACHE_TTL = float(os.environ.get("CAPTURE_CACHE_TTL", "60"))
+CAPTURE_CACHE_MAX_BYTES = int(os.environ.get("CAPTURE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CAPTURE_CACHE_DIR = os.environ.get("CAPTURE_CACHE_DIR", os.path.expanduser("~/.cache/netflix-screenshot-tool"))
+
+# Background capture workers and how many jobs may wait for one before
+# new submissions are turned away
+CAPTURE_WORKERS = int(os.environ.get("CAPTURE_WORKERS", "2"))
+CAPTURE_QUEUE_SIZE = int(os.environ.get("CAPTURE_QUEUE_SIZE", "8"))
+CAPTURE_JOB_TTL = 600  # Seconds a finished job stays available for polling
+CAPTURE_POLL_INTERVAL = 0.5  # Seconds between reruns that check on a running capture
+
+# Per-session gallery: only thumbnails are kept in st.session_state, full
+# captures are written to a private session directory under GALLERY_DIR and
+# read back when opened. Login captures are kept in memory only.
+# Directories of sessions idle for longer than GALLERY_TTL are removed.
+GALLERY_DIR = os.environ.get("GALLERY_DIR", os.path.join(tempfile.gettempdir(), "netflix-screenshot-gallery"))
+GALLERY_MAX_ITEMS = int(os.environ.get("GALLERY_MAX_ITEMS", "100"))
+GALLERY_TTL = float(os.environ.get("GALLERY_TTL", str(24 * 3600)))
+GALLERY_PAGE_SIZE = int(os.environ.get("GALLERY_PAGE_SIZE", "12"))
+GALLERY_COLUMNS = 4
+GALLERY_THUMBNAIL_WIDTH = 320
+
+# Browser pool settings: number of warm Chrome sessions kept per process and
+# how many captures a session serves before it is recycled
+BROWSER_POOL_SIZE = int(os.environ.get("BROWSER_POOL_SIZE", "2"))
+BROWSER_MAX_USES = int(os.environ.get("BROWSER_MAX_USES", "50"))
+BROWSER_ACQUIRE_TIMEOUT = float(os.environ.get("BROWSER_ACQUIRE_TIMEOUT", "60"))
+
+# Browser supervisor: sessions whose process tree grows past the RSS limit or
+# that are older than the age limit are recycled, and the tree is killed
+# outright if quitting leaves processes behind
+BROWSER_MAX_RSS_MB = int(os.environ.get("BROWSER_MAX_RSS_MB", "1024"))
+BROWSER_MAX_AGE = float(os.environ.get("BROWSER_MAX_AGE", "1800"))
+BROWSER_SAMPLE_INTERVAL = float(os.environ.get("BROWSER_SAMPLE_INTERVAL", "15"))
+BROWSER_PROCESS_NAMES = ("chromedriver", "chrome", "chromium", "chromium-browser", "headless_shell")
+# Environment variable marking chromedriver (and the Chrome it starts) as launched by this app
+BROWSER_OWNER_ENV = "NETFLIX_SCREENSHOT_OWNER"
+
+# Circuit breaker in front of Chrome startup: after BROWSER_BREAKER_FAILURES
+# failed starts in a row, requests fail fast for the cooldown, then a single
+# probe start decides whether to close it again. Each failed probe doubles
+# the cooldown up to BROWSER_BREAKER_MAX_COOLDOWN.
+BROWSER_BREAKER_FAILURES = int(os.environ.get("BROWSER_BREAKER_FAILURES", "3"))
+BROWSER_BREAKER_COOLDOWN = float(os.environ.get("BROWSER_BREAKER_COOLDOWN", "30"))
+BROWSER_BREAKER_MAX_COOLDOWN = float(os.environ.get("BROWSER_BREAKER_MAX_COOLDOWN", "300"))
+BROWSER_BREAKER_PROBES = int(os.environ.get("BROWSER_BREAKER_PROBES", "1"))  # Successful probes needed to close
+
+# Page readiness: the listed strategies run in order and share one timeout budget
+CAPTURE_WAIT_STRATEGIES = [name.strip() for name in os.environ.get("CAPTURE_WAIT_STRATEGIES", "ready_state,visual_stability").split(",") if name.strip()]
+CAPTURE_WAIT_TIMEOUT = float(os.environ.get("CAPTURE_WAIT_TIMEOUT", "10"))
+CAPTURE_WAIT_SELECTOR = os.environ.get("CAPTURE_WAIT_SELECTOR", "")
+NETWORK_IDLE_WINDOW = 0.5  # Seconds without network activity that count as idle
+NETWORK_IDLE_MAX_INFLIGHT = 2  # Long-polling requests that may stay open while idle
+VISUAL_STABILITY_INTERVAL = 0.3  # Seconds between frames compared for stability
+# Hash bits two consecutive frames may differ by and still count as stable, so
+# carousels, spinners and blinking carets do not hold the wait until the timeout
+VISUAL_STABILITY_THRESHOLD = int(os.environ.get("VISUAL_STABILITY_THRESHOLD", "4"))
+
+# Screenshot backend: "webdriver" (get_screenshot_as_png) or "cdp", which calls
+# Page.captureScreenshot directly. With a CDP_CAPTURE_FORMAT other than png
+# the browser draws the timestamp and encodes the final image itself, so the
+# screenshot never goes through PIL. Clipped captures are always taken as PNG
+# and stamped by PIL, since the in-page badge sits in the viewport's top-right
+# corner and a clip may leave it out.
+CAPTURE_BACKEND = os.environ.get("CAPTURE_BACKEND", "webdriver")
+CDP_CAPTURE_FORMAT = os.environ.get("CDP_CAPTURE_FORMAT", "jpeg")  # png, jpeg or webp
+CDP_CAPTURE_QUALITY = int(os.environ.get("CDP_CAPTURE_QUALITY", os.environ.get("SCREENSHOT_QUALITY", "85")))
+CDP_CAPTURE_CLIP = os.environ.get("CDP_CAPTURE_CLIP", "")  # "x,y,width,height" in CSS pixels
+CDP_DEVICE_SCALE_FACTOR = float(os.environ.get("CDP_DEVICE_SCALE_FACTOR", "1"))
+CDP_OPTIMIZE_FOR_SPEED = os.environ.get("CDP_OPTIMIZE_FOR_SPEED", "1") == "1"
+
+# Screencast recordings: frames come from Page.startScreencast (read from the
+# performance log) and frames within SCREENCAST_DUPLICATE_THRESHOLD hash bits
+# of the last kept one are dropped. If the browser sends no screencast frames
+# within SCREENCAST_FIRST_FRAME_TIMEOUT, Page.captureScreenshot is polled instead.
+SCREENCAST_DURATION = float(os.environ.get("SCREENCAST_DURATION", "10"))
+SCREENCAST_MAX_FRAMES = int(os.environ.get("SCREENCAST_MAX_FRAMES", "300"))
+SCREENCAST_QUALITY = int(os.environ.get("SCREENCAST_QUALITY", "70"))
+SCREENCAST_MAX_WIDTH = int(os.environ.get("SCREENCAST_MAX_WIDTH", "1280"))
+SCREENCAST_EVERY_NTH_FRAME = int(os.environ.get("SCREENCAST_EVERY_NTH_FRAME", "1"))
+SCREENCAST_DUPLICATE_THRESHOLD = int(os.environ.get("SCREENCAST_DUPLICATE_THRESHOLD", "2"))
+SCREENCAST_FIRST_FRAME_TIMEOUT = 2.0
+SCREENCAST_POLL_INTERVAL = 0.2  # Seconds between polled frames in the fallback
+
+# User-supplied URLs must resolve to public addresses only, so the app cannot
+# be used to read pages on the server's own network. Hosts listed here (comma
+# separated) are exempt, e.g. an intranet site the app is meant to capture.
+# Browsers that open such URLs send all their traffic through a local proxy
+# that applies the same rule to every request, not just the first.
+CAPTURE_ALLOWED_HOSTS = [host.strip().lower() for host in os.environ.get("CAPTURE_ALLOWED_HOSTS", "").split(",") if host.strip()]
+PUBLIC_PROXY_TIMEOUT = 30  # Seconds a proxied connection may sit idle
+NAT64_PREFIX = ipaddress.ip_network("64:ff9b::/96")  # Embeds an IPv4 address in its last 32 bits
+
+# Viewport presets for batch captures of public pages, applied with
+# Emulation.setDeviceMetricsOverride so one browser can serve all of them
+VIEWPORT_PRESETS = {
+    "Desktop": {"width": 1920, "height": 1080, "deviceScaleFactor": 1, "mobile": False},
+    "Tablet": {"width": 820, "height": 1180, "deviceScaleFactor": 1, "mobile": True},
+    "Mobile": {"width": 390, "height": 844, "deviceScaleFactor": 1, "mobile": True},
+}
+
+# Page-load profile for captures, one of PAGE_LOAD_PROFILES. Blocking is done
+# with Network.setBlockedURLs; resource types are blocked by URL pattern
+# because execute_cdp_cmd cannot answer Fetch.requestPaused events.
+PAGE_LOAD_PROFILE = os.environ.get("PAGE_LOAD_PROFILE", "full")
+PAGE_BLOCK_URLS = [pattern.strip() for pattern in os.environ.get("PAGE_BLOCK_URLS", "").split(",") if pattern.strip()]
+# Count requests and bytes per capture from the performance log
+PAGE_LOAD_STATS = os.environ.get("PAGE_LOAD_STATS", "1") == "1"
+
+RESOURCE_TYPE_URL_PATTERNS = {
+    "media": ["*.mp4*", "*.webm*", "*.m3u8*", "*.m4s*", "*.mp3*"],
+    "font": ["*.woff*", "*.ttf*", "*.otf*", "*.eot*"],
+    "image": ["*.jpg*", "*.jpeg*", "*.png*", "*.gif*", "*.webp*", "*.avif*", "*.svg*", "*.ico*"],
+}
+TRACKER_URL_PATTERNS = [
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*facebook.net*",
+    "*scorecardresearch.com*", "*hotjar.com*", "*nr-data.net*", "*branch.io*", "*adsrvr.org*",
+]
+# images: "full", "save-data" (asks servers for lighter images) or "off"
+PAGE_LOAD_PROFILES = {
+    "full": {"block_types": [], "block_trackers": False, "images": "full", "reduced_motion": False},
+    "lite": {"block_types": ["media", "font"], "block_trackers": True, "images": "save-data", "reduced_motion": True},
+    "text": {"block_types": ["media", "font"], "block_trackers": True, "images": "off", "reduced_motion": True},
+}
+
+# Font faces tried in order for every piece of text drawn on an image
+# (Liberation Sans from fonts-liberation is metrically compatible with Arial)
+FONT_FACES = ["Arial", "LiberationSans-Regular.ttf", "DejaVuSans.ttf"]
+
+# Output encoding for annotated screenshots, one of ENCODER_PROFILES
+SCREENSHOT_FORMAT = os.environ.get("SCREENSHOT_FORMAT", "png")
+SCREENSHOT_QUALITY = int(os.environ.get("SCREENSHOT_QUALITY", "85"))
+PNG_COMPRESS_LEVEL = int(os.environ.get("PNG_COMPRESS_LEVEL", "6"))
+PNG_OPTIMIZE = os.environ.get("PNG_OPTIMIZE", "0") == "1"
+# Width of the downscaled JPEG previews shown with st.image (0 shows full size)
+PREVIEW_MAX_WIDTH = int(os.environ.get("PREVIEW_MAX_WIDTH", "0"))
+
+ENCODER_PROFILES = {
+    "png": {"format": "PNG", "mime": "image/png", "extension": "png",
+            "params": {"compress_level": PNG_COMPRESS_LEVEL, "optimize": PNG_OPTIMIZE}},
+    "png-fast": {"format": "PNG", "mime": "image/png", "extension": "png",
+                 "params": {"compress_level": 1}},
+    # For lossless WebP, quality sets the compression effort (0 is fastest)
+    "webp-lossless": {"format": "WEBP", "mime": "image/webp", "extension": "webp",
+                      "params": {"lossless": True, "quality": 0, "method": 0}},
+    "webp": {"format": "WEBP", "mime": "image/webp", "extension": "webp",
+             "params": {"quality": SCREENSHOT_QUALITY, "method": 4}},
+    "jpeg": {"format": "JPEG", "mime": "image/jpeg", "extension": "jpg",
+             "params": {"quality": SCREENSHOT_QUALITY}},
+}
+
+# Side of the difference hash grid used to tell visually changed frames
+# apart; PERCEPTUAL_HASH_SIZE squared bits per hash
+PERCEPTUAL_HASH_SIZE = int(os.environ.get("PERCEPTUAL_HASH_SIZE", "16"))
+# The hash only sees edges, so fingerprints also carry the mean colour; frames
+# whose mean differs by more than this in any channel (0-255) count as changed
+COLOR_CHANGE_THRESHOLD = int(os.environ.get("COLOR_CHANGE_THRESHOLD", "8"))
+
+# Where the chromium and chromium-driver packages from packages.txt install their binaries
+APT_CHROMEDRIVER_PATHS = [
+    "/usr/bin/chromedriver",
+    "/usr/lib/chromium/chromedriver",
+    "/usr/lib/chromium-browser/chromedriver",
+]
+APT_CHROMIUM_PATHS = [
+    "/usr/bin/chromium",
+    "/usr/bin/chromium-browser",
+]
+# Layout of the webdriver-manager download cache
+WDM_CHROMEDRIVER_GLOB = os.path.expanduser("~/.wdm/drivers/chromedriver/*/*/chromedriver")
+
+# Tracing: timing spans around every capture stage, dispatched to the sinks
+# named in TRACE_SINKS. When disabled a span is a shared no-op context.
+TRACING_ENABLED = os.environ.get("TRACING_ENABLED", "0") == "1"
+TRACE_SINKS = [name.strip() for name in os.environ.get("TRACE_SINKS", "json,histogram").split(",") if name.strip()]
+# Prometheus text export: rewritten file and/or a local /metrics endpoint (0 disables)
+METRICS_FILE = os.environ.get("METRICS_FILE", "")
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+METRICS_FILE_INTERVAL = 5  # Minimum seconds between rewrites of METRICS_FILE
+HISTOGRAM_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Process-wide histograms and gauges exported in Prometheus text format
+class MetricsRegistry:
+    def __init__(self, buckets=HISTOGRAM_BUCKETS):
+        self.buckets = buckets
+        self._histograms = {}
+        self._gauges = {}
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, value, labels=None, help_text=""):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            self._help.setdefault(name, ("histogram", help_text))
+            histogram = self._histograms.setdefault(key, {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0})
+            histogram["counts"][bisect.bisect_left(self.buckets, value)] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def set_gauge(self, name, value, labels=None, help_text=""):
+        with self._lock:
+            self._help.setdefault(name, ("gauge", help_text))
+            self._gauges[(name, tuple(sorted((labels or {}).items())))] = value
+
+    def render_prometheus(self):
+        lines = []
+        with self._lock:
+            for name, (kind, help_text) in sorted(self._help.items()):
+                if help_text:
+                    lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                if kind == "gauge":
+                    for (gauge_name, labels), value in sorted(self._gauges.items()):
+                        if gauge_name == name:
+                            lines.append(f"{name}{format_labels(labels)} {value}")
+                    continue
+                for (histogram_name, labels), histogram in sorted(self._histograms.items()):
+                    if histogram_name != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(self.buckets + ("+Inf",), histogram["counts"]):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{format_labels(labels + (('le', str(bound)),))} {cumulative}")
+                    lines.append(f"{name}_sum{format_labels(labels)} {histogram['sum']}")
+                    lines.append(f"{name}_count{format_labels(labels)} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        # One row per histogram for the sidebar admin panel
+        rows = []
+        with self._lock:
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                rows.append({"metric": name + format_labels(labels), "count": histogram["count"],
+                             "mean ms": round(1000 * histogram["sum"] / histogram["count"], 1),
+                             "p95 ms <=": self._quantile_bound(histogram, 0.95)})
+            for (name, labels), value in sorted(self._gauges.items()):
+                rows.append({"metric": name + format_labels(labels), "value": value})
+        return rows
+
+    def _quantile_bound(self, histogram, quantile):
+        target, cumulative = quantile * histogram["count"], 0
+        for bound, count in zip(self.buckets, histogram["counts"]):
+            cumulative += count
+            if cumulative >= target:
+                return 1000 * bound
+        return None
+
+# Function to format Prometheus labels
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+# Request handler for the local /metrics endpoint
+class MetricsHandler(http.server.BaseHTTPRequestHandler):
+    registry = None
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+# Function to get the process-wide metrics registry, starting its exporters
+@st.cache_resource
+def get_metrics_registry():
+    registry = MetricsRegistry()
+    if METRICS_PORT:
+        handler = type("BoundMetricsHandler", (MetricsHandler,), {"registry": registry})
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", METRICS_PORT), handler)
+        threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+        print(f"Serving metrics on http://127.0.0.1:{METRICS_PORT}/metrics")
+    # Flush the last observations that the rewrite interval held back
+    atexit.register(write_metrics_file, registry, True)
+    return registry
+
+# Trace sinks: each receives one finished span as a dict
+def log_span_json(span):
+    logging.getLogger("netflix_screenshot.trace").info(json.dumps(span))
+
+def record_span_histogram(span):
+    registry = get_metrics_registry()
+    registry.observe("capture_stage_seconds", span["duration_ms"] / 1000, {"stage": span["name"], "status": span["status"]},
+                     "Time spent in each capture stage")
+    write_metrics_file(registry)
+
+TRACE_SINK_FACTORIES = {
+    "json": log_span_json,
+    "histogram": record_span_histogram,
+}
+
+# Function to get the process-wide list of trace sinks (append to add one)
+@st.cache_resource
+def get_trace_sinks():
+    if "json" in TRACE_SINKS:
+        logger = logging.getLogger("netflix_screenshot.trace")
+        if not logger.handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+    unknown = [name for name in TRACE_SINKS if name not in TRACE_SINK_FACTORIES]
+    if unknown:
+        # Checked once here rather than failing every span when it closes
+        print(f"Ignoring unknown TRACE_SINKS {', '.join(unknown)}; known sinks: {', '.join(TRACE_SINK_FACTORIES)}")
+    return [TRACE_SINK_FACTORIES[name] for name in TRACE_SINKS if name not in unknown]
+
+# Function to rewrite METRICS_FILE at most once every METRICS_FILE_INTERVAL seconds
+def write_metrics_file(registry, force=False):
+    if not METRICS_FILE:
+        return
+    now = time.monotonic()
+    if not force and now - getattr(registry, "file_written", 0) < METRICS_FILE_INTERVAL:
+        return
+    registry.file_written = now
+    with open(METRICS_FILE + ".tmp", "w") as f:
+        f.write(registry.render_prometheus())
+    os.replace(METRICS_FILE + ".tmp", METRICS_FILE)
+
+# A timed span around one stage of a capture
+class TraceSpan:
+    __slots__ = ("name", "attributes", "started")
+
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = attributes
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        span = {
+            "name": self.name,
+            "duration_ms": round(1000 * (time.perf_counter() - self.started), 3),
+            "status": "error" if exc_type else "ok",
+            "timestamp": time.time(),
+            "thread": threading.current_thread().name,
+        }
+        if self.attributes:
+            span["attributes"] = self.attributes
+        if exc_type:
+            span["error"] = repr(exc)
+        for sink in get_trace_sinks():
+            try:
+                sink(span)
+            except Exception as e:
+                print(f"Trace sink {getattr(sink, '__name__', sink)} failed: {e}")
+        return False
+
+NULL_SPAN = contextlib.nullcontext()
+
+# Function to time a block of code as a named span when tracing is enabled
+def trace_span(name, **attributes):
+    if not TRACING_ENABLED:
+        return NULL_SPAN
+    return TraceSpan(name, attributes)
 
 # Function to get Indian current datetime with AM/PM format
-def get_indian_datetime():
+def get_indian_datetime(timestamp=None):
     india_timezone = pytz.timezone('Asia/Kolkata')
-    now = datetime.datetime.now(india_timezone)
+    if timestamp is None:
+        now = datetime.datetime.now(india_timezone)
+    else:
+        now = datetime.datetime.fromtimestamp(timestamp, india_timezone)
     return now.strftime("%d-%m-%Y %I:%M:%S %p %Z")  # %I for 12-hour format, %p for AM/PM
 
+# Function to load a font face at a given size, remembering failed lookups too
+# (st.cache_resource rather than lru_cache so the cache outlives each rerun,
+# which re-executes this script in a fresh namespace)
+@st.cache_resource(max_entries=64, show_spinner=False)
+def load_font(face, size):
+    try:
+        return ImageFont.truetype(face, size)
+    except IOError:
+        return None
+
+# Function to get the first available font at a given size
+def get_font(size):
+    for face in FONT_FACES:
+        font = load_font(face, size)
+        if font is not None:
+            return font
+    return ImageFont.load_default()
+
+# Function to pre-render the timestamp badge composited onto screenshots
+@st.cache_resource(max_entries=16, show_spinner=False)
+def render_timestamp_overlay(text, font_size):
+    font = get_font(font_size)
+    text_width, text_height = font.getbbox(text)[2:4]
+
+    # Semi-transparent background for better readability, text padded 15px inside it
+    tile = Image.new("RGBA", (text_width + 30, text_height + 30), (0, 0, 0, 200))
+    ImageDraw.Draw(tile).text((15, 15), text, font=font, fill=(255, 255, 255, 255))
+    return tile
+
+# Function to get the encode time and output size per profile, accumulated
+# for the whole process rather than per rerun
+@st.cache_resource
+def get_encode_stats_store():
+    return {"profiles": {}, "lock": threading.Lock()}
+
+# Function to encode an image with one of the configured encoder profiles
+def encode_image(image, profile_name=None):
+    profile_name = profile_name or SCREENSHOT_FORMAT
+    profile = ENCODER_PROFILES[profile_name]
+    if profile["format"] == "JPEG" and image.mode != "RGB":
+        image = image.convert("RGB")
+
+    started = time.perf_counter()
+    result_bytes = io.BytesIO()
+    with trace_span("encode", profile=profile_name):
+        image.save(result_bytes, format=profile["format"], **profile["params"])
+    elapsed = time.perf_counter() - started
+
+    store = get_encode_stats_store()
+    with store["lock"]:
+        stats = store["profiles"].setdefault(profile_name, {"count": 0, "seconds": 0.0, "bytes": 0})
+        stats["count"] += 1
+        stats["seconds"] += elapsed
+        stats["bytes"] += result_bytes.tell()
+
+    return result_bytes.getvalue()
+
+# Function to decode image bytes without keeping the source buffer around
+def decode_image(data):
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    return image
+
+# Function to summarise the encode stats as table rows
+def get_encode_stats():
+    store = get_encode_stats_store()
+    with store["lock"]:
+        return [
+            {"profile": name, "images": stats["count"],
+             "avg encode ms": round(1000 * stats["seconds"] / stats["count"], 1),
+             "avg KB": round(stats["bytes"] / stats["count"] / 1024, 1)}
+            for name, stats in store["profiles"].items()
+        ]
+
+# A screenshot in whichever forms have been asked for so far
+class CaptureResult:
+    """
+    Holds a decoded image and/or its encoded bytes. Each representation is
+    produced on first use and memoized, so display, download and the
+    capture cache all share the same bytes instead of re-encoding.
+    """
+
+    def __init__(self, image=None, data=None, profile_name=None, metadata=None):
+        self.profile_name = profile_name or SCREENSHOT_FORMAT
+        self.metadata = metadata or {}
+        self._image = image
+        self._encoded = {}
+        if data is not None:
+            self._encoded[self.profile_name] = data
+        self._lock = threading.Lock()
+
+    @property
+    def image(self):
+        with self._lock:
+            if self._image is None:
+                self._image = decode_image(self._encoded[self.profile_name])
+            return self._image
+
+    @property
+    def data(self):
+        return self.encoded(self.profile_name)
+
+    @property
+    def mime(self):
+        return ENCODER_PROFILES[self.profile_name]["mime"]
+
+    @property
+    def extension(self):
+        return ENCODER_PROFILES[self.profile_name]["extension"]
+
+    def encoded(self, profile_name):
+        with self._lock:
+            if profile_name not in self._encoded:
+                self._encoded[profile_name] = encode_image(self._image or decode_image(self._encoded[self.profile_name]), profile_name)
+            return self._encoded[profile_name]
+
+    def display_data(self):
+        # Downscaled JPEG preview for st.image, or the full image when previews are off
+        if not PREVIEW_MAX_WIDTH:
+            return self.data
+        with self._lock:
+            if "preview" not in self._encoded:
+                image = self._image or decode_image(self._encoded[self.profile_name])
+                if image.width <= PREVIEW_MAX_WIDTH:
+                    self._encoded["preview"] = None
+                else:
+                    preview_height = round(image.height * PREVIEW_MAX_WIDTH / image.width)
+                    preview = image.convert("RGB").resize((PREVIEW_MAX_WIDTH, preview_height), Image.Resampling.BILINEAR)
+                    preview_bytes = io.BytesIO()
+                    preview.save(preview_bytes, format="JPEG", quality=80)
+                    self._encoded["preview"] = preview_bytes.getvalue()
+            preview = self._encoded["preview"]
+        return preview or self.data
+
+    def thumbnail(self, max_width):
+        # Small JPEG for gallery grids, made once when the capture is stored
+        with self._lock:
+            image = self._image or decode_image(self._encoded[self.profile_name])
+        thumbnail = image.convert("RGB")
+        thumbnail.thumbnail((max_width, max_width * 4), Image.Resampling.BILINEAR)
+        thumbnail_bytes = io.BytesIO()
+        thumbnail.save(thumbnail_bytes, format="JPEG", quality=75)
+        return thumbnail_bytes.getvalue()
+
+    def release_image(self):
+        # Keep only the encoded bytes; the image is decoded again if needed
+        self.data
+        with self._lock:
+            self._image = None
+
+# Function to measure every encoder profile against the same image
+def compare_encoders(result):
+    image = result.image
+    rows = []
+    for name in ENCODER_PROFILES:
+        started = time.perf_counter()
+        size = len(encode_image(image, name))
+        rows.append({"profile": name, "encode ms": round(1000 * (time.perf_counter() - started), 1),
+                     "KB": round(size / 1024, 1)})
+    return rows
+
+# Function to find the area the timestamp badge covers on an image of this size
+def get_timestamp_overlay_box(width, height):
+    # Same font size as add_timestamp_to_image; the in-page CDP badge uses
+    # matching metrics. The margin absorbs wider digits in other timestamps.
+    font_size = int(height * 0.10)
+    overlay = render_timestamp_overlay(get_indian_datetime(), font_size)
+    margin = font_size // 2
+    return (max(0, width - overlay.width - margin), 0, width, min(height, overlay.height + margin))
+
+# Function to compute a difference hash of an image, blanking the excluded boxes first
+def perceptual_hash(image, exclude=(), hash_size=PERCEPTUAL_HASH_SIZE):
+    grayscale = image.convert("L")
+    draw = ImageDraw.Draw(grayscale)
+    for box in exclude:
+        draw.rectangle(box, fill=0)
+    pixels = list(grayscale.resize((hash_size + 1, hash_size), Image.Resampling.BOX).getdata())
+    bits = 0
+    for row in range(hash_size):
+        for column in range(hash_size):
+            left = pixels[row * (hash_size + 1) + column]
+            bits = (bits << 1) | (left > pixels[row * (hash_size + 1) + column + 1])
+    return f"{bits:0{hash_size * hash_size // 4}x}"
+
+# Function to count the bits two perceptual hashes differ in
+def hash_distance(first, second):
+    return bin(int(first, 16) ^ int(second, 16)).count("1")
+
+# Function to get the mean colour of an image, blanking the excluded boxes first
+def mean_color(image, exclude=()):
+    rgb = image.convert("RGB")
+    draw = ImageDraw.Draw(rgb)
+    for box in exclude:
+        draw.rectangle(box, fill=(0, 0, 0))
+    return list(rgb.resize((1, 1), Image.Resampling.BOX).getpixel((0, 0)))
+
+# Function to fingerprint an image by its difference hash and mean colour
+def fingerprint_image(image, exclude=()):
+    return {"hash": perceptual_hash(image, exclude), "color": mean_color(image, exclude)}
+
+# Function to fingerprint a stamped capture, ignoring its timestamp badge
+def fingerprint_capture(image):
+    return fingerprint_image(image, exclude=[get_timestamp_overlay_box(image.width, image.height)])
+
+# Function to compare two fingerprints, returning (hash bits, largest mean
+# colour channel difference); the colour part is None if either lacks one
+def fingerprint_distance(first, second):
+    color = None
+    if first.get("color") and second.get("color"):
+        color = max(abs(a - b) for a, b in zip(first["color"], second["color"]))
+    return hash_distance(first["hash"], second["hash"]), color
+
+# Function to tell whether two fingerprints look like the same frame
+def fingerprints_match(first, second, hash_threshold, color_threshold=COLOR_CHANGE_THRESHOLD):
+    bits, color = fingerprint_distance(first, second)
+    return bits <= hash_threshold and (color is None or color <= color_threshold)
+
 # Function to add timestamp to screenshot with extra large size
-def add_timestamp_to_image(image_bytes):
-    # Convert bytes to PIL Image
-    image = Image.open(io.BytesIO(image_bytes))
+def add_timestamp_to_image(image, metadata=None):
+    # Accept encoded bytes straight from the browser or an already decoded image
+    if not isinstance(image, Image.Image):
+        image = decode_image(image)
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA")
     
     # Get timestamp
     timestamp = get_indian_datetime()
     
-    # Create draw object
-    draw = ImageDraw.Draw(image)
-    
     # Calculate font size based on image dimensions (about 10% of image height for much larger text)
     font_size = int(image.height * 0.10)  # Super large font size (doubled from previous)
     
-    # Try to use a standard font or fall back to default
-    try:
-        font = ImageFont.truetype("Arial", font_size)
-    except IOError:
-        try:
-            # Try another common font if Arial is not available
-            font = ImageFont.truetype("DejaVuSans.ttf", font_size)
-        except IOError:
-            font = ImageFont.load_default()
-    
-    # Calculate text position (top right with padding)
-    text_width, text_height = draw.textbbox((0, 0), timestamp, font=font)[2:4]
-    
-    # Make semi-transparent background for better readability
-    background_box = [(image.width - text_width - 30, 0), 
-                      (image.width, text_height + 30)]
-    draw.rectangle(background_box, fill=(0, 0, 0, 200))  # More opaque background
-    
-    # Position text on the background
-    position = (image.width - text_width - 15, 15)
+    # Composite the cached badge in the top right corner
+    with trace_span("annotate"):
+        overlay = render_timestamp_overlay(timestamp, font_size)
+        image.paste(overlay, (image.width - overlay.width, 0), overlay)
     
-    # Draw text with extra visibility
-    draw.text(position, timestamp, font=font, fill=(255, 255, 255, 255))
-    
-    # Convert back to bytes
-    result_bytes = io.BytesIO()
-    image.save(result_bytes, format='PNG')
-    result_bytes.seek(0)
-    
-    return result_bytes
+    # Encoding is deferred until display, download or the cache asks for bytes
+    return CaptureResult(image, metadata=metadata)
 
 # Helper function to create a download button for images
-def get_image_download_button(img_bytes, filename, button_text):
+def show_image_download_button(result, filename, button_text, key=None):
+    """
+    Renders a download button that sends the raw image bytes once instead of
+    inlining them into the page as a base64 data URI
+    """
+    data = result.data
+    with trace_span("export", kind="download"):
+        st.download_button(button_text, data=data, file_name=filename, mime=result.mime, key=key)
+
+# Function to bundle screenshots into a single ZIP archive, one entry at a time
+def build_zip_archive(files):
+    archive_bytes = io.BytesIO()
+    # Images are already compressed, so entries are stored rather than deflated
+    with trace_span("export", kind="zip"):
+        with zipfile.ZipFile(archive_bytes, "w", compression=zipfile.ZIP_STORED) as archive:
+            for filename, data in files:
+                archive.writestr(filename, data)
+    return archive_bytes.getvalue()
+
+# Function to check that a path points at an executable binary
+def is_executable(path):
+    return bool(path) and os.path.isfile(path) and os.access(path, os.X_OK)
+
+# Function to locate chromedriver and Chromium once per process
+@st.cache_resource
+def resolve_chromedriver():
     """
-    Generates a download button for a given image
+    Probes the usual install locations once and remembers the result so that
+    capture requests never repeat the lookup or its network round trip. A
+    failed lookup is remembered too; captures then fail fast with its error.
     """
-    img_bytes.seek(0)
-    b64 = base64.b64encode(img_bytes.read()).decode()
-    href = f'<a href="data:image/png;base64,{b64}" download="{filename}"><button style="background-color:#4CAF50;color:white;padding:8px 16px;border:none;border-radius:4px;cursor:pointer;">{button_text}</button></a>'
-    return href
+    driver_path, source, error = None, None, None
+    candidates = [("CHROMEDRIVER_PATH", os.environ.get("CHROMEDRIVER_PATH"))]
+    candidates += [("chromium-driver", path) for path in APT_CHROMEDRIVER_PATHS]
+    # Newest webdriver-manager download first
+    candidates += [("webdriver-manager cache", path)
+                   for path in sorted(glob.glob(WDM_CHROMEDRIVER_GLOB), key=os.path.getmtime, reverse=True)]
+    candidates.append(("PATH", shutil.which("chromedriver")))
+    for candidate_source, path in candidates:
+        if is_executable(path):
+            driver_path, source = path, candidate_source
+            break
+
+    if driver_path is None:
+        # Last resort: a single download attempt, never repeated per request
+        try:
+            driver_path, source = ChromeDriverManager().install(), "webdriver-manager download"
+        except Exception as e:
+            print(f"ChromeDriverManager failed: {e}")
+            error = f"webdriver-manager: {e}"
+
+    if driver_path is None:
+        # What Selenium would otherwise run on every start (common in cloud environments)
+        try:
+            driver_path, source = SeleniumManager().driver_location(Options()), "selenium-manager"
+        except Exception as e:
+            print(f"Selenium Manager failed: {e}")
+            error = f"{error}; selenium-manager: {str(e).splitlines()[0]}"
+            source = "not found"
+
+    browser_path = os.environ.get("CHROMIUM_PATH")
+    if not is_executable(browser_path):
+        browser_path = next((path for path in APT_CHROMIUM_PATHS if is_executable(path)), None)
+
+    print(f"Resolved chromedriver: {driver_path or 'none'} ({source}), browser: {browser_path or 'default'}")
+    return {"driver_path": driver_path, "source": source, "browser_path": browser_path, "error": error if driver_path is None else None}
+
+# Function to build the Chrome options shared by every browser session
+def create_chrome_options(page_load_strategy="normal", performance_log=False):
+    # Configure Chrome options for headless mode
+    chrome_options = Options()
+    chrome_options.add_argument("--headless")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument(f"--window-size={CAPTURE_WINDOW_SIZE}")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.page_load_strategy = page_load_strategy
+    if performance_log:
+        # Network events for the network-idle wait are read from the performance log
+        chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+
+    browser_path = resolve_chromedriver()["browser_path"]
+    if browser_path:
+        chrome_options.binary_location = browser_path
+    return chrome_options
+
+# Closed/open/half-open circuit breaker around a flaky backend
+class CircuitBreaker:
+    """
+    Closed: calls go through and consecutive failures are counted. Open:
+    calls are refused until the cooldown has passed. Half-open: one probe
+    call at a time goes through; enough successful probes close the
+    breaker, a failed one opens it again with a longer cooldown.
+    """
+
+    STATE_CODES = {"closed": 0, "half-open": 1, "open": 2}
+
+    def __init__(self, name, failure_threshold, cooldown, max_cooldown, probe_successes):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.base_cooldown = cooldown
+        self.max_cooldown = max(cooldown, max_cooldown)
+        self.probe_successes = max(1, probe_successes)
+        self.state = "closed"
+        self.cooldown = cooldown
+        self.failures = 0
+        self.last_error = None
+        self.transitions = collections.deque(maxlen=20)
+        self._opened_at = None
+        self._probing = False
+        self._probe_count = 0
+        self._lock = threading.Lock()
 
-# Function to capture Netflix screenshot
-def get_netflix_screenshot():
+    def allow_request(self):
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open":
+                if time.monotonic() - self._opened_at < self.cooldown:
+                    return False
+                self._transition("half-open", "cooldown elapsed")
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            if self.state == "half-open":
+                self._probing = False
+                self._probe_count += 1
+                if self._probe_count >= self.probe_successes:
+                    self.cooldown = self.base_cooldown
+                    self._transition("closed", "probe succeeded")
+
+    def record_failure(self, error):
+        with self._lock:
+            self.last_error = str(error).splitlines()[0] if str(error) else type(error).__name__
+            if self.state == "half-open":
+                self._probing = False
+                self.cooldown = min(self.max_cooldown, self.cooldown * 2)
+                self._transition("open", f"probe failed: {self.last_error}")
+            elif self.state == "closed":
+                self.failures += 1
+                if self.failures >= self.failure_threshold:
+                    self._transition("open", f"{self.failures} failures in a row, last: {self.last_error}")
+
+    def release_probe(self):
+        # For a probe that ended without an outcome, e.g. on KeyboardInterrupt
+        with self._lock:
+            self._probing = False
+
+    def is_open(self):
+        with self._lock:
+            return self.state == "open" and time.monotonic() - self._opened_at < self.cooldown
+
+    def retry_in(self):
+        with self._lock:
+            if self.state != "open":
+                return 0.0
+            return max(0.0, self.cooldown - (time.monotonic() - self._opened_at))
+
+    def summary(self):
+        retry_in = self.retry_in()
+        with self._lock:
+            return {"state": self.state, "failures": self.failures, "cooldown": self.cooldown,
+                    "retry_in": round(retry_in, 1), "last_error": self.last_error,
+                    "transitions": list(self.transitions)}
+
+    def _transition(self, state, reason):
+        self.transitions.append({"time": get_indian_datetime(), "from": self.state, "to": state, "reason": reason})
+        print(f"{self.name} circuit {self.state} -> {state}: {reason}")
+        self.state = state
+        if state == "open":
+            self._opened_at = time.monotonic()
+            self._probe_count = 0
+        elif state == "closed":
+            self.failures = 0
+        get_metrics_registry().set_gauge(f"{self.name}_circuit_state", self.STATE_CODES[state],
+                                         help_text="Circuit breaker state: 0 closed, 1 half-open, 2 open")
+
+# Function to get the process-wide breaker for Chrome startup
+@st.cache_resource
+def get_browser_breaker():
+    return CircuitBreaker("browser", BROWSER_BREAKER_FAILURES, BROWSER_BREAKER_COOLDOWN,
+                          BROWSER_BREAKER_MAX_COOLDOWN, BROWSER_BREAKER_PROBES)
+
+# Function to start a new headless Chrome session, failing fast while the
+# breaker says Chrome cannot start
+def start_chrome_driver(chrome_options=None):
+    resolved = resolve_chromedriver()
+    driver_path = resolved["driver_path"]
+    if driver_path is None:
+        # Resolution already failed once; retrying it per request would repeat its network lookups
+        raise RuntimeError(f"No chromedriver found ({resolved['error']}); set CHROMEDRIVER_PATH and restart")
+    if chrome_options is None:
+        chrome_options = create_chrome_options()
+    breaker = get_browser_breaker()
+    if not breaker.allow_request():
+        raise RuntimeError(f"Chrome is unavailable ({breaker.last_error}); next attempt in {breaker.retry_in():.0f}s")
     try:
-        # Configure Chrome options for headless mode
-        chrome_options = Options()
-        chrome_options.add_argument("--headless")
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--window-size=1920,1080")
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        
-        # Try multiple approaches to initialize Chrome driver
+        with trace_span("driver_startup"):
+            # The owner marker lets the supervisor tell this app's browsers from anyone else's
+            environment = dict(os.environ, **{BROWSER_OWNER_ENV: get_browser_owner_marker()})
+            driver = webdriver.Chrome(service=Service(driver_path, env=environment), options=chrome_options)
+    except Exception as e:
+        breaker.record_failure(e)
+        raise
+    except BaseException:
+        # Interrupted: nothing to record, but the probe slot must not stay taken
+        breaker.release_probe()
+        raise
+    breaker.record_success()
+    return driver
+
+# Function to start a Chrome session for page captures; public_only sessions
+# can only reach public addresses
+def start_capture_driver(public_only=False):
+    # Captures decide for themselves when the page is ready, so navigation
+    # returns as soon as the DOM is parsed instead of waiting for every asset
+    chrome_options = create_chrome_options(
+        page_load_strategy="eager",
+        performance_log=PAGE_LOAD_STATS or "network_idle" in CAPTURE_WAIT_STRATEGIES,
+    )
+    if PAGE_LOAD_PROFILES[PAGE_LOAD_PROFILE]["reduced_motion"]:
+        chrome_options.add_argument("--autoplay-policy=user-gesture-required")
+    if public_only:
+        restrict_to_public_hosts(chrome_options)
+    return start_chrome_driver(chrome_options)
+
+# Function to send all of a browser's traffic through the public-only proxy
+def restrict_to_public_hosts(chrome_options):
+    chrome_options.add_argument(f"--proxy-server=http://127.0.0.1:{get_public_proxy().server_port}")
+    # Loopback addresses would otherwise skip the proxy
+    chrome_options.add_argument("--proxy-bypass-list=<-loopback>")
+    # Anything that still asks the browser's own resolver gets nothing back
+    chrome_options.add_argument("--host-resolver-rules=MAP * ~NOTFOUND, EXCLUDE 127.0.0.1")
+    chrome_options.add_argument("--force-webrtc-ip-handling-policy=disable_non_proxied_udp")
+    return chrome_options
+
+# Function to apply the page-load profile to a capture session before navigating
+def apply_page_load_profile(driver, profile_name=None):
+    profile = PAGE_LOAD_PROFILES[profile_name or PAGE_LOAD_PROFILE]
+    patterns = list(PAGE_BLOCK_URLS)
+    for resource_type in profile["block_types"] + (["image"] if profile["images"] == "off" else []):
+        patterns += RESOURCE_TYPE_URL_PATTERNS[resource_type]
+    if profile["block_trackers"]:
+        patterns += TRACKER_URL_PATTERNS
+    if not patterns and profile["images"] == "full" and not profile["reduced_motion"]:
+        return
+
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+    headers = {"Save-Data": "on"} if profile["images"] == "save-data" else {}
+    driver.execute_cdp_cmd("Network.setExtraHTTPHeaders", {"headers": headers})
+    features = [{"name": "prefers-reduced-motion", "value": "reduce"}] if profile["reduced_motion"] else []
+    driver.execute_cdp_cmd("Emulation.setEmulatedMedia", {"features": features})
+
+# Network activity of one navigation, read from the performance log
+class NetworkLog:
+    def __init__(self, driver):
+        self.driver = driver
+        self.requests = 0
+        self.bytes = 0
+        self.blocked = 0
+        self.failed = 0
+        self.inflight = set()
+        self.last_activity = time.monotonic()
+        self._seen = set()
+        # Discard events left over from the previous page
+        driver.get_log("performance")
+
+    def poll(self):
+        for entry in self.driver.get_log("performance"):
+            message = json.loads(entry["message"])["message"]
+            params = message.get("params", {})
+            request_id = params.get("requestId")
+            method = message.get("method")
+            if method == "Network.requestWillBeSent":
+                # Redirects reuse the request ID and are counted once
+                if request_id not in self._seen:
+                    self._seen.add(request_id)
+                    self.requests += 1
+                self.inflight.add(request_id)
+            elif method == "Network.loadingFinished":
+                self.bytes += int(params.get("encodedDataLength", 0))
+                self.inflight.discard(request_id)
+            elif method == "Network.loadingFailed":
+                if params.get("blockedReason"):
+                    self.blocked += 1
+                else:
+                    self.failed += 1
+                self.inflight.discard(request_id)
+            else:
+                continue
+            self.last_activity = time.monotonic()
+
+    def summary(self):
+        self.poll()
+        return {"requests": self.requests, "bytes": self.bytes, "blocked": self.blocked, "failed": self.failed}
+
+# Page readiness strategies: each waits until its condition holds or the
+# deadline passes, and returns a truthy value (a frame for visual
+# stability) when the condition was met or None on timeout. network is the
+# NetworkLog of the navigation, or None without the performance log.
+def wait_for_ready_state(driver, deadline, network):
+    while time.monotonic() < deadline:
+        if driver.execute_script("return document.readyState") == "complete":
+            return True
+        time.sleep(0.1)
+    return None
+
+def wait_for_network_idle(driver, deadline, network):
+    while time.monotonic() < deadline:
+        network.poll()
+        if len(network.inflight) <= NETWORK_IDLE_MAX_INFLIGHT and time.monotonic() - network.last_activity >= NETWORK_IDLE_WINDOW:
+            return True
+        time.sleep(0.1)
+    return None
+
+def wait_for_selector(driver, deadline, network):
+    if not CAPTURE_WAIT_SELECTOR:
+        return True
+    try:
+        WebDriverWait(driver, max(0, deadline - time.monotonic())).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, CAPTURE_WAIT_SELECTOR))
+        )
+        return True
+    except Exception:
+        return None
+
+def wait_for_visual_stability(driver, deadline, network):
+    # The page is stable once two consecutive frames look alike: identical
+    # bytes, or fingerprints within VISUAL_STABILITY_THRESHOLD
+    previous = driver.get_screenshot_as_png()
+    previous_fingerprint = None
+    while time.monotonic() + VISUAL_STABILITY_INTERVAL < deadline:
+        time.sleep(VISUAL_STABILITY_INTERVAL)
+        frame = driver.get_screenshot_as_png()
+        if frame == previous:
+            return frame
+        if previous_fingerprint is None:
+            previous_fingerprint = fingerprint_image(decode_image(previous))
+        fingerprint = fingerprint_image(decode_image(frame))
+        if fingerprints_match(fingerprint, previous_fingerprint, VISUAL_STABILITY_THRESHOLD):
+            return frame
+        previous, previous_fingerprint = frame, fingerprint
+    return None
+
+def wait_fixed_delay(driver, deadline, network):
+    # The original fixed three second wait, kept for comparison
+    time.sleep(max(0, min(3, deadline - time.monotonic())))
+    return True
+
+PAGE_WAIT_STRATEGIES = {
+    "ready_state": wait_for_ready_state,
+    "network_idle": wait_for_network_idle,
+    "selector": wait_for_selector,
+    "visual_stability": wait_for_visual_stability,
+    "sleep": wait_fixed_delay,
+}
+
+# Function to navigate to a page and wait until it is ready to capture
+def load_page(driver, url, strategies=None, timeout=None):
+    """
+    Returns which condition ended the wait, how long it took, the request
+    and byte counts of the page when PAGE_LOAD_STATS is on and, when the
+    last strategy already took a stable screenshot, that frame
+    """
+    strategies = CAPTURE_WAIT_STRATEGIES if strategies is None else strategies
+    timeout = CAPTURE_WAIT_TIMEOUT if timeout is None else timeout
+    apply_page_load_profile(driver)
+    network = NetworkLog(driver) if PAGE_LOAD_STATS or "network_idle" in strategies else None
+
+    with trace_span("navigation", url=url):
+        driver.get(url)
+
+    started = time.monotonic()
+    deadline = started + timeout
+    condition, frame = "navigation", None
+    with trace_span("wait", strategies=",".join(strategies)):
+        for name in strategies:
+            result = PAGE_WAIT_STRATEGIES[name](driver, deadline, network)
+            if result is None:
+                condition, frame = f"timeout ({name})", None
+                break
+            condition = name
+            frame = result if isinstance(result, bytes) else None
+    elapsed = time.monotonic() - started
+    return {"condition": condition, "elapsed": elapsed, "frame": frame,
+            "network": network.summary() if network else None}
+
+# Function to capture the viewport (or a clip of it) over the DevTools protocol
+def capture_screenshot_cdp(driver, image_format="png", quality=None, clip=None,
+                           device_scale_factor=1.0, optimize_for_speed=True):
+    params = {"format": image_format, "fromSurface": True, "optimizeForSpeed": optimize_for_speed}
+    if image_format != "png" and quality is not None:
+        params["quality"] = quality
+    if clip:
+        x, y, width, height = clip
+        params["clip"] = {"x": x, "y": y, "width": width, "height": height, "scale": 1}
+    if device_scale_factor != 1:
+        driver.execute_cdp_cmd("Emulation.setDeviceMetricsOverride", {
+            "width": 0, "height": 0, "deviceScaleFactor": device_scale_factor, "mobile": False,
+        })
+    try:
+        return base64.b64decode(driver.execute_cdp_cmd("Page.captureScreenshot", params)["data"])
+    finally:
+        if device_scale_factor != 1:
+            driver.execute_cdp_cmd("Emulation.clearDeviceMetricsOverride", {})
+
+# Function to draw the timestamp badge into the page itself, sized like the
+# one add_timestamp_to_image composites (10% of the viewport height)
+def stamp_timestamp_in_page(driver, timestamp):
+    driver.execute_script("""
+        let badge = document.getElementById('capture-timestamp');
+        if (!badge) {
+            badge = document.createElement('div');
+            badge.id = 'capture-timestamp';
+            badge.style.cssText = 'position:fixed;top:0;right:0;z-index:2147483647;padding:15px;' +
+                'background:rgba(0,0,0,0.78);color:#fff;font:10vh Arial,"Liberation Sans",sans-serif;' +
+                'line-height:1;white-space:nowrap;pointer-events:none';
+            document.documentElement.appendChild(badge);
+        }
+        badge.textContent = arguments[0];
+    """, timestamp)
+
+# Function to take a screenshot with the configured backend. Returns
+# (data, profile_name, stamped); unstamped data is PNG for add_timestamp_to_image.
+# Pass override_scale=False when the caller already set device metrics.
+def take_screenshot(driver, frame=None, override_scale=True):
+    if CAPTURE_BACKEND == "cdp":
+        clip = [float(value) for value in CDP_CAPTURE_CLIP.split(",")] if CDP_CAPTURE_CLIP else None
+        image_format = "png" if clip else CDP_CAPTURE_FORMAT
+        stamped = image_format != "png"
+        if stamped:
+            stamp_timestamp_in_page(driver, get_indian_datetime())
+        with trace_span("screenshot", backend="cdp", format=image_format):
+            data = capture_screenshot_cdp(driver, image_format, CDP_CAPTURE_QUALITY, clip,
+                                          CDP_DEVICE_SCALE_FACTOR if override_scale else 1, CDP_OPTIMIZE_FOR_SPEED)
+        return data, image_format, stamped
+
+    # Reuse the frame the stability check already took
+    if frame is None:
+        with trace_span("screenshot", backend="webdriver"):
+            frame = driver.get_screenshot_as_png()
+    return frame, "png", False
+
+# Tracks the process tree of every Chrome session the app starts
+class BrowserSupervisor:
+    """
+    Samples the RSS of each tracked session's chromedriver and browser
+    processes, says when a session is due for recycling, and makes sure
+    nothing is left running once a session is shut down
+    """
+
+    def __init__(self, max_rss_mb, max_age):
+        self.max_rss = max_rss_mb * 1024 * 1024
+        self.max_age = max_age
+        self.killed = 0
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def track(self, driver):
+        pid = getattr(getattr(getattr(driver, "service", None), "process", None), "pid", None)
+        with self._lock:
+            self._sessions[id(driver)] = {"pid": pid, "started": time.monotonic(), "rss": 0}
+        return driver
+
+    def recycle_reason(self, driver):
+        with self._lock:
+            session = self._sessions.get(id(driver))
+        if session is None:
+            return None
+        if time.monotonic() - session["started"] > self.max_age:
+            return "age"
+        session["rss"] = self._tree_rss(session["pid"])
+        if session["rss"] > self.max_rss:
+            return "memory"
+        return None
+
+    def shutdown(self, driver):
+        with self._lock:
+            session = self._sessions.pop(id(driver), None)
+        processes = self._process_tree(session["pid"]) if session else []
+        try:
+            driver.quit()
+        except Exception:
+            pass  # Whatever quit() left behind is killed below
+        self._kill(processes)
+
+    def sample(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+        for session in sessions:
+            session["rss"] = self._tree_rss(session["pid"])
+        summary = {"browsers": len(sessions), "rss_mb": round(sum(session["rss"] for session in sessions) / 1024 / 1024, 1),
+                   "killed": self.killed}
+        registry = get_metrics_registry()
+        registry.set_gauge("browser_sessions", summary["browsers"], help_text="Chrome sessions currently open")
+        registry.set_gauge("browser_rss_bytes", sum(session["rss"] for session in sessions),
+                           help_text="Resident memory of all Chrome process trees")
+        return summary
+
+    def reap_orphans(self):
+        # Only browsers carrying the owner marker of an app process that has
+        # since exited are reaped; browsers of live app processes (this one,
+        # another Streamlit worker, monitor.py) and anything else are left alone
+        orphans = []
+        for process in psutil.process_iter(["name", "ppid", "status"]):
+            try:
+                info = process.info
+                if info["status"] == psutil.STATUS_ZOMBIE and info["ppid"] == os.getpid():
+                    os.waitpid(process.pid, os.WNOHANG)
+                    continue
+                if not (info["name"] or "").startswith(BROWSER_PROCESS_NAMES):
+                    continue
+                owner = process.environ().get(BROWSER_OWNER_ENV)
+                if owner and not is_owner_alive(owner):
+                    orphans.append(process)
+            except (psutil.Error, OSError):
+                continue  # Includes processes of other users whose environment cannot be read
+        orphans = list({tree_process.pid: tree_process for process in orphans
+                        for tree_process in self._process_tree(process.pid)}.values())
+        self._kill(orphans)
+        if orphans:
+            print(f"Reaped {len(orphans)} orphaned browser processes")
+        return len(orphans)
+
+    def _process_tree(self, pid):
+        if not pid:
+            return []
+        try:
+            parent = psutil.Process(pid)
+            return [parent] + parent.children(recursive=True)
+        except psutil.Error:
+            return []
+
+    def _tree_rss(self, pid):
+        rss = 0
+        for process in self._process_tree(pid):
+            try:
+                rss += process.memory_info().rss
+            except psutil.Error:
+                pass
+        return rss
+
+    def _kill(self, processes):
+        alive = [process for process in processes if process.is_running()]
+        for process in alive:
+            with contextlib.suppress(psutil.Error):
+                process.kill()
+        _, still_alive = psutil.wait_procs(alive, timeout=3)
+        with self._lock:
+            self.killed += len(alive) - len(still_alive)
+
+# Function to get the marker put in the environment of every browser this
+# process starts: its PID and start time, so a reused PID does not match
+def get_browser_owner_marker():
+    process = psutil.Process()
+    return f"{process.pid}:{process.create_time():.2f}"
+
+# Function to check whether the app process named by an owner marker still runs
+def is_owner_alive(marker):
+    try:
+        pid, created = marker.split(":")
+        return f"{psutil.Process(int(pid)).create_time():.2f}" == created
+    except (ValueError, psutil.Error):
+        return False
+
+# Function to get the process-wide browser supervisor, reaping leftovers
+# from earlier runs and sampling memory in the background
+@st.cache_resource
+def get_browser_supervisor():
+    supervisor = BrowserSupervisor(BROWSER_MAX_RSS_MB, BROWSER_MAX_AGE)
+    supervisor.reap_orphans()
+
+    def sample_forever():
+        while True:
+            try:
+                supervisor.sample()
+            except Exception as e:
+                print(f"Browser sampling failed: {e}")
+            time.sleep(BROWSER_SAMPLE_INTERVAL)
+
+    threading.Thread(target=sample_forever, name="browser-supervisor", daemon=True).start()
+    return supervisor
+
+# Pool of warm headless Chrome sessions shared by every script run in the process
+class BrowserPool:
+    """
+    Lends out warm Chrome sessions and recycles them after max_uses captures,
+    as soon as a capture using them fails, or when the supervisor reports
+    them over their memory or age limit
+    """
+
+    def __init__(self, size, max_uses, factory=start_capture_driver, supervisor=None):
+        self.size = max(1, size)
+        self.max_uses = max(1, max_uses)
+        self.factory = factory
+        self.supervisor = supervisor
+        self.recycled = collections.Counter()
+        self._idle = queue.LifoQueue()  # Most recently used session is the warmest
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._uses = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    @contextlib.contextmanager
+    def driver(self, timeout=BROWSER_ACQUIRE_TIMEOUT):
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError(f"No browser session became free within {timeout:.0f}s")
         driver = None
         try:
-            # Try with ChromeDriverManager
-            service = Service(ChromeDriverManager().install())
-            driver = webdriver.Chrome(service=service, options=chrome_options)
-        except Exception as e:
-            st.warning(f"ChromeDriverManager failed: {e}")
+            driver = self._checkout()
+            yield driver
+        except BaseException:
+            # A session that failed mid-capture is not trusted again
+            self._discard(driver)
+            driver = None
+            raise
+        finally:
+            if driver is not None:
+                self._checkin(driver)
+            self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "open": len(self._uses),
+                "idle": self._idle.qsize(),
+                "recycled": dict(self.recycled),
+            }
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+        while True:
             try:
-                # Try with direct Chrome path (common in cloud environments)
-                driver = webdriver.Chrome(options=chrome_options)
-            except Exception as e2:
-                st.error(f"Failed to initialize Chrome driver: {e2}")
-                # Show a placeholder image instead when running in cloud
-                return create_placeholder_image()
-        
-        # Navigate to Netflix
-        driver.get("https://www.netflix.com")
-        
-        # Wait for the page to load properly
-        time.sleep(3)
-        
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(driver)
+
+    def _checkout(self):
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if self._is_healthy(driver) and not self._recycle_reason(driver):
+                return driver
+            self._discard(driver)
+        driver = self.factory()
+        if self.supervisor:
+            self.supervisor.track(driver)
+        with self._lock:
+            self._uses[id(driver)] = 0
+        return driver
+
+    def _checkin(self, driver):
+        with self._lock:
+            uses = self._uses.get(id(driver), 0) + 1
+            self._uses[id(driver)] = uses
+            recycle = self._closed or uses >= self.max_uses
+        if recycle or self._recycle_reason(driver):
+            self._discard(driver)
+            return
+        try:
+            # Drop the previous page so idle sessions hold as little memory as possible
+            driver.get("about:blank")
+        except Exception:
+            self._discard(driver)
+            return
+        self._idle.put(driver)
+
+    def _is_healthy(self, driver):
+        try:
+            return driver.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    def _recycle_reason(self, driver):
+        reason = self.supervisor.recycle_reason(driver) if self.supervisor else None
+        if reason:
+            with self._lock:
+                self.recycled[reason] += 1
+        return reason
+
+    def _discard(self, driver):
+        if driver is None:
+            return
+        with self._lock:
+            self._uses.pop(id(driver), None)
+        if self.supervisor:
+            # Quits the session and kills anything quit() left running
+            self.supervisor.shutdown(driver)
+            return
+        try:
+            driver.quit()
+        except Exception:
+            pass  # Ignore errors when closing the driver
+
+# Function to get the process-wide browser pool
+@st.cache_resource
+def get_browser_pool():
+    pool = BrowserPool(BROWSER_POOL_SIZE, BROWSER_MAX_USES, supervisor=get_browser_supervisor())
+    atexit.register(pool.close)
+    return pool
+
+# Function to get the process-wide pool of browsers for user-supplied URLs.
+# Its sessions start on first use, so it costs nothing until a batch runs.
+@st.cache_resource
+def get_public_browser_pool():
+    pool = BrowserPool(BROWSER_POOL_SIZE, BROWSER_MAX_USES, factory=lambda: start_capture_driver(public_only=True),
+                       supervisor=get_browser_supervisor())
+    atexit.register(pool.close)
+    return pool
+
+# Content-addressed cache of finished captures shared by every session
+class CaptureCache:
+    """
+    Maps a hash of the capture inputs to a CaptureResult, counted against
+    the byte budget by its encoded size. Concurrent misses on the same key
+    wait for a single capture. Entries past their TTL are no longer served
+    but stay, first in line for eviction, as the last good capture for when
+    no new one can be taken.
+    """
+
+    def __init__(self, ttl, max_bytes, directory=None):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0, "coalesced": 0}
+        self._entries = collections.OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._load_from_disk()
+
+    @staticmethod
+    def make_key(**inputs):
+        return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._lookup(key)
+            self.stats["hits" if entry else "misses"] += 1
+            return entry
+
+    def put(self, key, result):
+        entry = {"result": result, "created": time.time()}
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = entry
+            self._bytes += len(result.data)
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                self._remove(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+        if self.directory:
+            self._write_to_disk(key, entry)
+        return entry
+
+    def get_or_capture(self, key, capture):
+        """
+        Returns (entry, hit). capture() is only called when no fresh entry
+        exists and must return a CaptureResult.
+        """
+        entry = self.get(key)
+        if entry:
+            return entry, True
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            # Another session may have finished the same capture while we waited
+            with self._lock:
+                entry = self._lookup(key)
+                if entry:
+                    self.stats["coalesced"] += 1
+                    return entry, True
+            entry = self.put(key, capture())
+        with self._lock:
+            self._key_locks.pop(key, None)
+        return entry, False
+
+    def get_last_good(self, key):
+        with self._lock:
+            return self._entries.get(key)
+
+    def summary(self):
+        with self._lock:
+            return dict(self.stats, entries=len(self._entries), bytes=self._bytes)
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry["created"] > self.ttl:
+            # Kept as the last good capture until the byte budget needs the room
+            self._entries.move_to_end(key, last=False)
+            self.stats["expired"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= len(entry["result"].data)
+        if self.directory:
+            for path in self._disk_paths(key):
+                with contextlib.suppress(OSError):
+                    os.remove(path)
+
+    def _disk_paths(self, key):
+        return (os.path.join(self.directory, f"{key}.bin"), os.path.join(self.directory, f"{key}.json"))
+
+    def _write_to_disk(self, key, entry):
+        data_path, meta_path = self._disk_paths(key)
+        try:
+            # Write then rename so a crash never leaves a truncated entry behind
+            with open(data_path + ".tmp", "wb") as f:
+                f.write(entry["result"].data)
+            with open(meta_path + ".tmp", "w") as f:
+                json.dump({"metadata": entry["result"].metadata, "profile": entry["result"].profile_name,
+                           "created": entry["created"]}, f)
+            os.replace(data_path + ".tmp", data_path)
+            os.replace(meta_path + ".tmp", meta_path)
+        except OSError as e:
+            print(f"Capture cache write failed: {e}")
+
+    def _load_from_disk(self):
+        stored = []
+        for meta_path in glob.glob(os.path.join(self.directory, "*.json")):
+            key = os.path.basename(meta_path)[:-len(".json")]
+            data_path = self._disk_paths(key)[0]
+            try:
+                with open(meta_path) as f:
+                    meta = json.load(f)
+                if time.time() - meta["created"] > self.ttl:
+                    raise ValueError("expired")
+                with open(data_path, "rb") as f:
+                    data = f.read()
+            except (OSError, ValueError, KeyError):
+                for path in (data_path, meta_path):
+                    with contextlib.suppress(OSError):
+                        os.remove(path)
+                continue
+            result = CaptureResult(data=data, profile_name=meta["profile"], metadata=meta["metadata"])
+            stored.append((meta["created"], key, {"result": result, "created": meta["created"]}))
+        # Oldest first so the LRU order matches capture order
+        for _, key, entry in sorted(stored, key=lambda item: item[0]):
+            self._entries[key] = entry
+            self._bytes += len(entry["result"].data)
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            self._remove(next(iter(self._entries)))
+
+# Function to get the process-wide capture cache
+@st.cache_resource
+def get_capture_cache():
+    return CaptureCache(CAPTURE_CACHE_TTL, CAPTURE_CACHE_MAX_BYTES, CAPTURE_CACHE_DIR or None)
+
+# Function to capture a page in a pooled browser, raising on failure
+def capture_homepage_screenshot(url=NETFLIX_HOME_URL):
+    # Borrow a warm browser instead of launching a new one
+    with get_browser_pool().driver() as driver:
+        # Navigate to the page and wait until it is ready
+        wait = load_page(driver, url)
+
         # Take screenshot
-        screenshot = driver.get_screenshot_as_png()
-        
-        # Add timestamp to screenshot
-        return add_timestamp_to_image(screenshot)
-    except Exception as e:
-        st.error(f"Error taking screenshot: {e}")
-        return create_placeholder_image()
+        screenshot, profile_name, stamped = take_screenshot(driver, wait["frame"])
+
+    metadata = {"url": url, "wait_condition": wait["condition"], "wait_seconds": round(wait["elapsed"], 3),
+                "backend": CAPTURE_BACKEND, "page_load_profile": PAGE_LOAD_PROFILE, "network": wait["network"]}
+    return finish_capture(screenshot, profile_name, stamped, metadata)
+
+# Function to turn a take_screenshot() result into a stamped CaptureResult
+def finish_capture(screenshot, profile_name, stamped, metadata):
+    if stamped:
+        # Already stamped and encoded by the browser
+        return CaptureResult(data=screenshot, profile_name=profile_name, metadata=metadata)
+
+    # Add timestamp to screenshot
+    result = add_timestamp_to_image(screenshot, metadata)
+    del screenshot
+    # Results that outlive the capture keep only their encoded bytes
+    result.release_image()
+    return result
+
+# Function to check that a user-supplied URL points at a public web page.
+# Returns why it may not be captured, or None when it may.
+def check_public_url(url):
+    try:
+        parsed = urllib.parse.urlsplit(url)
+        port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    except ValueError:
+        return f"{url} is not a valid URL"
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        return f"{url} is not an http(s) URL"
+    host = parsed.hostname.lower()
+    if host in CAPTURE_ALLOWED_HOSTS:
+        return None
+    return resolve_public_address(host, port)[1]
+
+# Function to tell whether an address is on the public internet
+def is_public_address(address):
+    # Scoped IPv6 addresses carry a %interface suffix
+    ip = ipaddress.ip_address(address.split("%")[0])
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    elif ip in NAT64_PREFIX:
+        ip = ipaddress.IPv4Address(int(ip) & 0xFFFFFFFF)
+    return ip.is_global
+
+# Function to resolve a host once and check every address it has. Returns
+# (address to connect to, None), or (None, why the host may not be reached).
+# Allowed hosts are resolved but not checked.
+def resolve_public_address(host, port):
+    if not host:
+        return None, "no host given"
+    try:
+        addresses = [info[4][0] for info in socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)]
+    except (socket.gaierror, UnicodeError, OverflowError):
+        return None, f"{host} does not resolve"
+    if host.lower().rstrip(".") not in CAPTURE_ALLOWED_HOSTS:
+        for address in addresses:
+            if not is_public_address(address):
+                return None, f"{host} resolves to the non-public address {address}"
+    return addresses[0], None
+
+# Function to load a user-supplied URL in a public-only browser. The proxy has
+# already refused any request to a non-public host; a redirect onto one is
+# reported as an error here instead of capturing the browser's error page.
+def load_public_page(driver, url, strategies=None):
+    wait = load_page(driver, url, strategies)
+    reason = check_public_url(driver.current_url)
+    if reason:
+        raise ValueError(f"Redirected to a page that cannot be captured: {reason}")
+    return wait
+
+# Function to copy bytes both ways between two sockets until either side
+# closes or both stay quiet for PUBLIC_PROXY_TIMEOUT
+def relay_sockets(first, second):
+    peers = {first: second, second: first}
+    while True:
+        readable, _, _ = select.select(list(peers), [], [], PUBLIC_PROXY_TIMEOUT)
+        if not readable:
+            return
+        for source in readable:
+            data = source.recv(65536)
+            if not data:
+                return
+            peers[source].sendall(data)
+
+# Forward proxy for the browsers that open user-supplied URLs
+class PublicOnlyProxyHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Resolves each host the browser asks for, refuses non-public addresses
+    and connects to the exact address it checked. Every iframe, subresource
+    and redirect hop comes through here before any request is sent, and a
+    DNS answer that changes after the check cannot redirect the connection.
+    HTTPS arrives as CONNECT tunnels; plain HTTP is forwarded one request
+    per connection.
+    """
+
+    timeout = PUBLIC_PROXY_TIMEOUT
+    HOP_HEADERS = {"connection", "keep-alive", "proxy-connection", "proxy-authorization", "te", "trailer",
+                   "transfer-encoding", "upgrade"}
+
+    def do_CONNECT(self):
+        host, _, port = self.path.rpartition(":")
+        upstream = self._connect(host.strip("[]"), port)
+        if upstream is None:
+            return
+        with upstream:
+            self.send_response(200, "Connection Established")
+            self.end_headers()
+            relay_sockets(self.connection, upstream)
+        self.close_connection = True
+
+    def forward(self):
+        try:
+            url = urllib.parse.urlsplit(self.path)
+            port = url.port or 80
+        except ValueError:
+            self.send_error(400, "Bad request target")
+            return
+        if url.scheme != "http":
+            self.send_error(400, "Only absolute http:// URLs can be proxied")
+            return
+        upstream = self._connect(url.hostname, port)
+        if upstream is None:
+            return
+        connection = http.client.HTTPConnection(url.hostname, port, timeout=self.timeout)
+        connection.sock = upstream
+        try:
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            connection.putrequest(self.command, urllib.parse.urlunsplit(("", "", url.path or "/", url.query, "")),
+                                  skip_host=True, skip_accept_encoding=True)
+            for name, value in self.headers.items():
+                if name.lower() not in self.HOP_HEADERS:
+                    connection.putheader(name, value)
+            connection.endheaders(body or None)
+            response = connection.getresponse()
+            self.send_response_only(response.status, response.reason)
+            for name, value in response.getheaders():
+                if name.lower() not in self.HOP_HEADERS:
+                    self.send_header(name, value)
+            # The body is streamed as it arrives, so its end is the end of the connection
+            self.send_header("Connection", "close")
+            self.end_headers()
+            while self.command != "HEAD" and (chunk := response.read(65536)):
+                self.wfile.write(chunk)
+        except (OSError, http.client.HTTPException) as e:
+            print(f"Proxy request to {url.hostname} failed: {e}")
+        finally:
+            connection.close()
+        self.close_connection = True
+
+    do_GET = do_HEAD = do_POST = do_PUT = do_PATCH = do_DELETE = do_OPTIONS = forward
+
+    def _connect(self, host, port):
+        # Returns a socket connected to the checked address, or None after answering with an error
+        try:
+            port = int(port)
+            if not 0 < port < 65536:
+                raise ValueError(port)
+        except ValueError:
+            self.send_error(400, "Bad port")
+            return None
+        address, reason = resolve_public_address(host, port)
+        if reason:
+            print(f"Proxy refused {host}:{port}: {reason}")
+            self.send_error(403, reason)
+            return None
+        try:
+            return socket.create_connection((address, port), timeout=self.timeout)
+        except OSError as e:
+            self.send_error(502, f"Cannot connect to {host}:{port}: {e}")
+            return None
+
+    def log_message(self, format, *args):
+        pass
+
+# Function to get the process-wide public-only proxy, listening on a free loopback port
+@st.cache_resource
+def get_public_proxy():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), PublicOnlyProxyHandler)
+    threading.Thread(target=server.serve_forever, name="public-proxy", daemon=True).start()
+    atexit.register(server.shutdown)
+    return server
+
+# Function to capture one page at one viewport preset in an already borrowed browser
+def capture_in_viewport(driver, url, preset_name):
+    driver.execute_cdp_cmd("Emulation.setDeviceMetricsOverride", VIEWPORT_PRESETS[preset_name])
+    wait = load_public_page(driver, url)
+    screenshot, profile_name, stamped = take_screenshot(driver, wait["frame"], override_scale=False)
+    metadata = {"url": url, "preset": preset_name, "wait_condition": wait["condition"],
+                "wait_seconds": round(wait["elapsed"], 3), "backend": CAPTURE_BACKEND,
+                "page_load_profile": PAGE_LOAD_PROFILE, "network": wait["network"]}
+    return finish_capture(screenshot, profile_name, stamped, metadata)
+
+# Function to capture a list of public pages at several viewports, yielding
+# each item as soon as it finishes. Items are spread over as many pooled
+# browsers as the pool allows; each browser navigates through its share in turn.
+def capture_public_pages(urls, preset_names, pool=None):
+    pool = pool or get_public_browser_pool()
+    pending = queue.Queue()
+    for url in urls:
+        for preset_name in preset_names:
+            pending.put((url, preset_name))
+    total = pending.qsize()
+    finished = queue.Queue()
+    shares = {"running": min(pool.size, total), "error": None}
+    shares_lock = threading.Lock()
+
+    def capture_share():
+        try:
+            with pool.driver() as driver:
+                try:
+                    while True:
+                        try:
+                            url, preset_name = pending.get_nowait()
+                        except queue.Empty:
+                            break
+                        started = time.monotonic()
+                        item = {"url": url, "preset": preset_name, "status": "ok", "result": None, "error": None}
+                        try:
+                            item["result"] = capture_in_viewport(driver, url, preset_name)
+                        except Exception as e:
+                            item.update(status="failed", error=str(e).splitlines()[0])
+                        item["seconds"] = round(time.monotonic() - started, 2)
+                        finished.put(item)
+                finally:
+                    # Pooled sessions go back with their normal window metrics
+                    driver.execute_cdp_cmd("Emulation.clearDeviceMetricsOverride", {})
+        except Exception as e:
+            shares["error"] = str(e).splitlines()[0]
+        finally:
+            with shares_lock:
+                shares["running"] -= 1
+                last_share = shares["running"] == 0
+            # Items no share could get a browser for are reported as failed
+            while last_share:
+                try:
+                    url, preset_name = pending.get_nowait()
+                except queue.Empty:
+                    break
+                finished.put({"url": url, "preset": preset_name, "status": "failed", "result": None,
+                              "error": shares["error"], "seconds": 0})
+
+    for index in range(shares["running"]):
+        threading.Thread(target=capture_share, name=f"batch-capture-{index}", daemon=True).start()
+    for _ in range(total):
+        yield finished.get()
+
+# Function to get the cache key for the configured homepage capture
+def get_homepage_cache_key():
+    backend = {"backend": CAPTURE_BACKEND}
+    if CAPTURE_BACKEND == "cdp":
+        backend.update(cdp_format=CDP_CAPTURE_FORMAT, cdp_quality=CDP_CAPTURE_QUALITY, clip=CDP_CAPTURE_CLIP,
+                       scale=CDP_DEVICE_SCALE_FACTOR)
+    return CaptureCache.make_key(url=NETFLIX_HOME_URL, window_size=CAPTURE_WINDOW_SIZE,
+                                 wait=CAPTURE_WAIT_STRATEGIES, format=SCREENSHOT_FORMAT,
+                                 page_load_profile=PAGE_LOAD_PROFILE, block_urls=PAGE_BLOCK_URLS, **backend)
+
+# Function to capture the homepage through the shared cache, raising on failure
+def run_homepage_capture(bypass_cache=False, cache=None):
+    cache = cache or get_capture_cache()
+    key = get_homepage_cache_key()
+    if bypass_cache:
+        return cache.put(key, capture_homepage_screenshot()), False
+    return cache.get_or_capture(key, capture_homepage_screenshot)
+
+# Function to describe where a capture came from
+def show_capture_details(entry, hit):
+    if hit:
+        st.caption(f"Served from capture cache, captured {time.time() - entry['created']:.0f}s ago")
+    else:
+        metadata = entry["result"].metadata
+        st.caption(f"Page ready: {metadata['wait_condition']} after {metadata['wait_seconds']:.2f}s")
+        if metadata.get("network"):
+            st.caption(describe_network(metadata["network"], metadata["page_load_profile"]))
+
+# Function to summarise the network stats of a capture in one line
+def describe_network(network, profile_name):
+    return (f"Page load ({profile_name} profile): {network['requests']} requests, "
+            f"{network['bytes'] / 1024:.0f} KB transferred, {network['blocked']} blocked")
+
+# Function to get something to show when no new homepage capture can be
+# taken: the last good capture if there is one, otherwise the placeholder,
+# along with the time it was taken for the caption
+def get_fallback_capture():
+    entry = get_capture_cache().get_last_good(get_homepage_cache_key())
+    if entry:
+        st.caption(f"Showing the last good capture, taken {time.time() - entry['created']:.0f}s ago")
+        return entry["result"], get_indian_datetime(entry["created"])
+    # Show a placeholder image instead when running in cloud
+    return create_placeholder_image(), get_indian_datetime()
+
+# Function to stream raw screencast frames as (time, JPEG bytes). Each frame
+# is acknowledged only after the consumer is done with it, so the browser
+# never runs more than a frame ahead of the pipeline.
+def screencast_frames(driver, duration, max_frames):
+    deadline = time.monotonic() + duration
+    first_frame_deadline = time.monotonic() + SCREENCAST_FIRST_FRAME_TIMEOUT
+    count = 0
+    driver.get_log("performance")  # Drop the navigation's events
+    driver.execute_cdp_cmd("Page.startScreencast", {
+        "format": "jpeg", "quality": SCREENCAST_QUALITY, "maxWidth": SCREENCAST_MAX_WIDTH,
+        "maxHeight": SCREENCAST_MAX_WIDTH * 4, "everyNthFrame": SCREENCAST_EVERY_NTH_FRAME,
+    })
+    try:
+        while count < max_frames and time.monotonic() < deadline:
+            frames = []
+            for entry in driver.get_log("performance"):
+                message = json.loads(entry["message"])["message"]
+                if message.get("method") == "Page.screencastFrame":
+                    frames.append(message["params"])
+            if not frames:
+                if not count and time.monotonic() > first_frame_deadline:
+                    break
+                time.sleep(0.05)
+                continue
+            for params in frames:
+                yield params.get("metadata", {}).get("timestamp") or time.time(), base64.b64decode(params["data"])
+                count += 1
+                driver.execute_cdp_cmd("Page.screencastFrameAck", {"sessionId": params["sessionId"]})
+                if count >= max_frames:
+                    return
     finally:
-        # Close the browser if it was initialized
-        if 'driver' in locals() and driver is not None:
-            driver.quit()
+        with contextlib.suppress(Exception):
+            driver.execute_cdp_cmd("Page.stopScreencast", {})
+
+    if count:
+        return
+    print("No screencast frames arrived, polling Page.captureScreenshot instead")
+    while count < max_frames and time.monotonic() < deadline:
+        started = time.monotonic()
+        yield time.time(), capture_screenshot_cdp(driver, "jpeg", SCREENCAST_QUALITY)
+        count += 1
+        time.sleep(max(0, started + SCREENCAST_POLL_INTERVAL - time.monotonic()))
+
+# Function to decode frames and drop those that look like the last kept one
+def drop_duplicate_frames(frames, threshold, stats):
+    last_fingerprint = None
+    for frame_time, data in frames:
+        stats["received"] += 1
+        image = decode_image(data)
+        fingerprint = fingerprint_image(image)
+        if last_fingerprint is not None and fingerprints_match(fingerprint, last_fingerprint, threshold):
+            stats["dropped"] += 1
+            continue
+        last_fingerprint = fingerprint
+        yield frame_time, image
+
+# Function to stamp each frame with the cached timestamp overlay
+def stamp_frames(frames):
+    for frame_time, image in frames:
+        yield frame_time, add_timestamp_to_image(image).image
+
+# Function to work out how long each kept frame stays on screen, in milliseconds
+def get_frame_durations(times, end_time):
+    return [max(20, round(1000 * (end - start))) for start, end in zip(times, times[1:] + [end_time])]
+
+# Writes a screencast as an animated WebP
+class ScreencastWebPWriter:
+    """
+    Spools stamped frames into a temporary multi-page TIFF as they arrive and
+    builds the animation from it at the end, decoding one frame at a time
+    """
+    extension = "webp"
+    mime = "image/webp"
+
+    def __init__(self):
+        self.times = []
+        self._spool = tempfile.TemporaryFile()
+        self._writer = TiffImagePlugin.AppendingTiffWriter(self._spool, new=True)
+
+    def add(self, frame_time, image):
+        image.convert("RGB").save(self._writer, format="TIFF", compression="tiff_deflate")
+        self._writer.newFrame()
+        self.times.append(frame_time)
+
+    def close(self, end_time):
+        try:
+            if not self.times:
+                return None
+            self._writer.finalize()
+            self._spool.seek(0)
+            frames = Image.open(self._spool)
+            animation = io.BytesIO()
+            with trace_span("encode", profile="webp-animation"):
+                frames.save(animation, format="WEBP", save_all=True, duration=get_frame_durations(self.times, end_time),
+                            loop=0, quality=SCREENCAST_QUALITY, method=0)
+            return animation.getvalue()
+        finally:
+            self._spool.close()
+
+# Writes a screencast as a ZIP of JPEG frames with a timing index
+class ScreencastArchiveWriter:
+    """
+    Stores each stamped frame as soon as it arrives, in a ZIP spooled to a
+    temporary file, plus frames.json with each frame's time and duration
+    """
+    extension = "zip"
+    mime = "application/zip"
+
+    def __init__(self):
+        self.times = []
+        self._spool = tempfile.TemporaryFile()
+        self._archive = zipfile.ZipFile(self._spool, "w", compression=zipfile.ZIP_STORED)
+
+    def add(self, frame_time, image):
+        self._archive.writestr(f"frame_{len(self.times):04d}.jpg", encode_image(image, "jpeg"))
+        self.times.append(frame_time)
+
+    def close(self, end_time):
+        try:
+            if not self.times:
+                return None
+            index = [{"frame": f"frame_{i:04d}.jpg", "time": frame_time, "duration_ms": duration}
+                     for i, (frame_time, duration) in enumerate(zip(self.times, get_frame_durations(self.times, end_time)))]
+            self._archive.writestr("frames.json", json.dumps(index, indent=2))
+            self._archive.close()
+            self._spool.seek(0)
+            return self._spool.read()
+        finally:
+            self._spool.close()
+
+SCREENCAST_OUTPUTS = {
+    "Animated WebP": ScreencastWebPWriter,
+    "Frame archive (ZIP)": ScreencastArchiveWriter,
+}
+
+# Function to record a screencast of a page. progress, if given, is called
+# with the running stats after every kept frame.
+def record_screencast(url, output_name, duration=SCREENCAST_DURATION, progress=None):
+    writer = SCREENCAST_OUTPUTS[output_name]()
+    stats = collections.Counter()
+    supervisor = get_browser_supervisor()
+    chrome_options = restrict_to_public_hosts(create_chrome_options(page_load_strategy="eager", performance_log=True))
+    driver = supervisor.track(start_chrome_driver(chrome_options))
+    try:
+        # Carousels never settle, so only wait for the document itself
+        load_public_page(driver, url, strategies=["ready_state"])
+        started = time.monotonic()
+        with trace_span("screencast", output=writer.extension):
+            frames = screencast_frames(driver, duration, SCREENCAST_MAX_FRAMES)
+            frames = drop_duplicate_frames(frames, SCREENCAST_DUPLICATE_THRESHOLD, stats)
+            for frame_time, image in stamp_frames(frames):
+                writer.add(frame_time, image)
+                stats["kept"] += 1
+                if progress:
+                    progress(dict(stats, elapsed=time.monotonic() - started))
+            end_time = time.time()
+    finally:
+        supervisor.shutdown(driver)
+    return {"data": writer.close(end_time), "extension": writer.extension, "mime": writer.mime,
+            "received": stats["received"], "kept": stats["kept"], "dropped": stats["dropped"]}
+
+# Bounded pool of background threads that run captures off the script thread
+class CaptureWorker:
+    """
+    Runs capture jobs on a fixed number of threads. Jobs are polled by ID,
+    a job identical to one already queued or running is answered with that
+    job's ID, and submissions beyond the queue size raise queue.Full.
+    """
+
+    def __init__(self, workers, queue_size):
+        self.max_outstanding = workers + queue_size
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="capture")
+        self._jobs = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, func):
+        with self._lock:
+            self._prune()
+            if key in self._inflight:
+                return self._inflight[key]
+            if len(self._inflight) >= self.max_outstanding:
+                # queue.Full rather than a class defined here: the worker outlives
+                # reruns, which redefine every class in this script
+                raise queue.Full(f"{len(self._inflight)} captures are already queued or running")
+            job = {"id": uuid.uuid4().hex, "key": key, "status": "queued", "result": None,
+                   "error": None, "submitted": time.time(), "finished": None}
+            self._jobs[job["id"]] = job
+            self._inflight[key] = job["id"]
+        self._executor.submit(self._run, job, func)
+        return job["id"]
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def summary(self):
+        with self._lock:
+            statuses = collections.Counter(job["status"] for job in self._jobs.values())
+            return {"queued": statuses["queued"], "running": statuses["running"],
+                    "done": statuses["done"], "failed": statuses["failed"],
+                    "capacity": self.max_outstanding}
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, job, func):
+        with self._lock:
+            job["status"] = "running"
+        try:
+            result, status, error = func(), "done", None
+        except Exception as e:
+            result, status, error = None, "failed", str(e)
+        with self._lock:
+            job.update(result=result, status=status, error=error, finished=time.time())
+            self._inflight.pop(job["key"], None)
+
+    def _prune(self):
+        cutoff = time.time() - CAPTURE_JOB_TTL
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job["finished"] and job["finished"] < cutoff]:
+            del self._jobs[job_id]
+
+# Function to get the process-wide capture worker
+@st.cache_resource
+def get_capture_worker():
+    worker = CaptureWorker(CAPTURE_WORKERS, CAPTURE_QUEUE_SIZE)
+    atexit.register(worker.shutdown)
+    return worker
+
+# Function to queue a homepage capture and return its job ID
+def submit_homepage_capture(bypass_cache=False):
+    cache = get_capture_cache()
+    # Fresh captures are only deduplicated against other fresh captures
+    key = ("fresh" if bypass_cache else "cached", get_homepage_cache_key())
+    return get_capture_worker().submit(key, lambda: run_homepage_capture(bypass_cache, cache))
+
+# Function to show the status of a capture job that is still queued or
+# running. Returns True in that case, and the caller schedules a rerun to
+# check again instead of holding the script thread until the job finishes.
+def show_capture_job_progress(job):
+    if job is None or job["status"] in ("done", "failed"):
+        return False
+    st.info(f"Capture {job['status']} for {time.time() - job['submitted']:.0f}s...")
+    return True
+
+# One browser session's captures
+class CaptureGallery:
+    """
+    Keeps a thumbnail and metadata per capture in memory and the full
+    capture on disk, so reruns only ever send thumbnails to the browser.
+    Files live in a private per-session directory and are only readable by
+    the app's user; private captures are never written to disk at all.
+    """
+
+    def __init__(self, root, max_items):
+        self.max_items = max_items
+        self.items = []  # Newest first
+        self._preview = (None, None)  # (item ID, bytes) for the opened item
+        try:
+            os.makedirs(root, mode=0o700, exist_ok=True)
+            self.directory = tempfile.mkdtemp(prefix="session-", dir=root)
+            # Removed as soon as the session's state is dropped, not only by the TTL sweep
+            weakref.finalize(self, shutil.rmtree, self.directory, True)
+        except OSError as e:
+            self.directory = None
+            print(f"Gallery directory unavailable, keeping captures in memory: {e}")
+
+    def add(self, result, label, filename, private=False):
+        item = {
+            "id": uuid.uuid4().hex,
+            "label": label,
+            "filename": filename,
+            "profile": result.profile_name,
+            "size": len(result.data),
+            "created": get_indian_datetime(),
+            "thumbnail": result.thumbnail(GALLERY_THUMBNAIL_WIDTH),
+        }
+        item["path"] = None
+        item["data"] = result.data
+        if self.directory and not private:
+            path = os.path.join(self.directory, f"{item['id']}.{result.extension}")
+            try:
+                with os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), "wb") as f:
+                    f.write(result.data)
+                item["path"], item["data"] = path, None
+            except OSError as e:
+                print(f"Gallery write failed, keeping capture in memory: {e}")
+        self.items.insert(0, item)
+        while len(self.items) > self.max_items:
+            self._remove(self.items.pop())
+        return item
+
+    def get(self, item_id):
+        return next((item for item in self.items if item["id"] == item_id), None)
+
+    def load(self, item):
+        # Full-resolution bytes, or None if the file was cleaned up
+        if item["path"] is None:
+            return item["data"]
+        try:
+            with open(item["path"], "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def load_preview(self, item):
+        # Downscaled preview for st.image, made once when the item is opened;
+        # the full bytes when previews are off or the capture is small already
+        if self._preview[0] != item["id"]:
+            data = self.load(item)
+            if data is None:
+                return None
+            self._preview = (item["id"], CaptureResult(data=data, profile_name=item["profile"]).display_data())
+        return self._preview[1]
+
+    def clear(self):
+        for item in self.items:
+            self._remove(item)
+        self.items = []
+        self._preview = (None, None)
+
+    def _remove(self, item):
+        if item["path"]:
+            with contextlib.suppress(OSError):
+                os.remove(item["path"])
+
+# Function to remove gallery directories of sessions idle past GALLERY_TTL
+def prune_gallery_dirs():
+    for directory in glob.glob(os.path.join(GALLERY_DIR, "*")):
+        with contextlib.suppress(OSError):
+            if time.time() - os.path.getmtime(directory) > GALLERY_TTL:
+                shutil.rmtree(directory, ignore_errors=True)
+
+# Function to get this browser session's gallery
+def get_gallery():
+    if "gallery" not in st.session_state:
+        prune_gallery_dirs()
+        st.session_state["gallery"] = CaptureGallery(GALLERY_DIR, GALLERY_MAX_ITEMS)
+    return st.session_state["gallery"]
+
+# Function to choose which gallery item is shown at full resolution
+def open_gallery_item(item_id):
+    st.session_state["gallery_open"] = item_id
+
+# Function to show the gallery as a paginated thumbnail grid
+def show_gallery():
+    gallery = get_gallery()
+    if not gallery.items:
+        return
+    st.write("---")
+    st.subheader(f"Gallery ({len(gallery.items)} captures)")
+
+    pages = -(-len(gallery.items) // GALLERY_PAGE_SIZE)
+    page = 1
+    if pages > 1:
+        page = min(st.number_input(f"Page (of {pages})", min_value=1, value=1, step=1, key="gallery_page"), pages)
+    items = gallery.items[(page - 1) * GALLERY_PAGE_SIZE:page * GALLERY_PAGE_SIZE]
+
+    columns = st.columns(GALLERY_COLUMNS)
+    for i, item in enumerate(items):
+        with columns[i % GALLERY_COLUMNS]:
+            st.image(item["thumbnail"], caption=item["label"], use_column_width=True)
+            st.button("Open", key=f"gallery_open_{item['id']}", on_click=open_gallery_item, args=(item["id"],))
+
+    # Only the opened item is read; the page gets its preview and the download its full bytes
+    item = gallery.get(st.session_state.get("gallery_open"))
+    if item:
+        with st.expander(f"{item['label']} ({item['size'] / 1024:.0f} KB)", expanded=True):
+            preview = gallery.load_preview(item)
+            data = gallery.load(item)
+            if preview is None or data is None:
+                st.warning("This capture is no longer available.")
+            else:
+                st.image(preview, caption=f"{item['label']} - {item['created']}", use_column_width=True)
+                show_image_download_button(CaptureResult(data=data, profile_name=item["profile"]), item["filename"],
+                                           "Download Screenshot", key="gallery_download")
+            st.button("Close", key="gallery_close", on_click=open_gallery_item, args=(None,))
+
+    st.button("Clear gallery", key="gallery_clear", on_click=clear_gallery)
+
+# Function to remove every capture from this session's gallery
+def clear_gallery():
+    get_gallery().clear()
+    st.session_state.pop("gallery_open", None)
 
 # Function to create a placeholder image when selenium fails
 def create_placeholder_image():
@@ -128,11 +2223,8 @@ def create_placeholder_image():
     image = Image.new('RGB', (width, height), color=(0, 0, 0))
     draw = ImageDraw.Draw(image)
     
-    # Try to use a font or fallback to default
-    try:
-        font = ImageFont.truetype("Arial", 36)
-    except:
-        font = ImageFont.load_default()
+    # Use the cached font lookup
+    font = get_font(36)
     
     # Add explanatory text and timestamp
     timestamp = get_indian_datetime()
@@ -140,41 +2232,21 @@ def create_placeholder_image():
     draw.text((width/2-200, height/2-50), message, font=font, fill=(255, 255, 255))
     draw.text((width/2-200, height/2+50), f"Timestamp: {timestamp}", font=font, fill=(255, 255, 255))
     
-    # Convert to bytes
-    result_bytes = io.BytesIO()
-    image.save(result_bytes, format='PNG')
-    result_bytes.seek(0)
-    
-    return result_bytes
+    # Encoded on first use like every other capture
+    return CaptureResult(image)
 
 # Function to perform Netflix login and take screenshots
 def login_netflix(email, password):
     screenshots = []
     try:
-        # Configure Chrome options for headless mode
-        chrome_options = Options()
-        chrome_options.add_argument("--headless")
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--window-size=1920,1080")
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        
-        # Try multiple approaches to initialize Chrome driver
+        # Start Chrome with the driver resolved at startup
         driver = None
         try:
-            # Try with ChromeDriverManager
-            service = Service(ChromeDriverManager().install())
-            driver = webdriver.Chrome(service=service, options=chrome_options)
+            driver = get_browser_supervisor().track(start_chrome_driver())
         except Exception as e:
-            st.warning(f"ChromeDriverManager failed in login: {e}")
-            try:
-                # Try with direct Chrome path (common in cloud environments)
-                driver = webdriver.Chrome(options=chrome_options)
-                st.info("Using direct Chrome instance for login")
-            except Exception as e2:
-                st.error(f"Failed to initialize Chrome driver for login: {e2}")
-                # Show placeholder images instead when running in cloud
-                return create_login_placeholder_images(email)
+            st.error(f"Failed to initialize Chrome driver for login: {e}")
+            # Show placeholder images instead when running in cloud
+            return create_login_placeholder_images(email)
         
         # If we reach here, we have a working driver
         st.info("Chrome driver initialized successfully for login")
@@ -360,12 +2432,9 @@ def login_netflix(email, password):
         st.error(f"Error setting up login process: {e}")
         return create_login_placeholder_images(email)
     finally:
-        # Close the browser if it was initialized
+        # Close the browser if it was initialized, killing anything quit() leaves behind
         if 'driver' in locals() and driver is not None:
-            try:
-                driver.quit()
-            except:
-                pass  # Ignore errors when closing the driver
+            get_browser_supervisor().shutdown(driver)
 
 # Function to create placeholder login images when selenium fails
 def create_login_placeholder_images(email):
@@ -377,13 +2446,9 @@ def create_login_placeholder_images(email):
     image1 = Image.new('RGB', (width, height), color=(0, 0, 0))
     draw = ImageDraw.Draw(image1)
     
-    # Try to use a font or fallback to default
-    try:
-        font = ImageFont.truetype("Arial", 36)
-        small_font = ImageFont.truetype("Arial", 24)
-    except:
-        font = ImageFont.load_default()
-        small_font = ImageFont.load_default()
+    # Use the cached font lookup
+    font = get_font(36)
+    small_font = get_font(24)
     
     # Add explanatory text and timestamp
     timestamp = get_indian_datetime()
@@ -392,11 +2457,8 @@ def create_login_placeholder_images(email):
     draw.text((width/2-300, height/2+50), f"Password: ********", font=small_font, fill=(255, 255, 255))
     draw.text((width/2-300, height/2+150), f"Timestamp: {timestamp}", font=small_font, fill=(255, 255, 255))
     
-    # Convert to bytes
-    result_bytes1 = io.BytesIO()
-    image1.save(result_bytes1, format='PNG')
-    result_bytes1.seek(0)
-    images.append(("Pre-login with credentials", add_timestamp_to_image(result_bytes1.getvalue())))
+    # Stamp the image directly, without an encode/decode round trip
+    images.append(("Pre-login with credentials", add_timestamp_to_image(image1)))
     
     # Create second image (post-login)
     image2 = Image.new('RGB', (width, height), color=(0, 0, 0))
@@ -405,11 +2467,8 @@ def create_login_placeholder_images(email):
     draw.text((width/2-300, height/2+50), f"Running in cloud environment", font=small_font, fill=(255, 255, 255))
     draw.text((width/2-300, height/2+100), f"Timestamp: {timestamp}", font=small_font, fill=(255, 255, 255))
     
-    # Convert to bytes
-    result_bytes2 = io.BytesIO()
-    image2.save(result_bytes2, format='PNG')
-    result_bytes2.seek(0)
-    images.append(("Post-login Netflix", add_timestamp_to_image(result_bytes2.getvalue())))
+    # Stamp the image directly, without an encode/decode round trip
+    images.append(("Post-login Netflix", add_timestamp_to_image(image2)))
     
     return images
 
@@ -421,6 +2480,9 @@ def main():
         layout="wide"
     )
     
+    # Resolve chromedriver once at startup; every capture path reuses the result
+    resolved_driver = resolve_chromedriver()
+
     st.title("🎬 Netflix Screenshot Tool")
     st.write(f"Current Indian Time: {get_indian_datetime()}")
     
@@ -428,27 +2490,60 @@ def main():
     st.sidebar.title("Options")
     option = st.sidebar.radio(
         "Choose an option:",
-        ["Homepage Screenshot", "Login and Capture"]
+        ["Homepage Screenshot", "Login and Capture", "Batch Public Capture", "Screencast"]
     )
+    compare_formats = st.sidebar.checkbox("Compare output formats")
+    capture_pending = False
     
     if option == "Homepage Screenshot":
+        bypass_cache = st.sidebar.checkbox("Bypass capture cache")
         if st.button("Capture Netflix Homepage"):
-            with st.spinner("Getting Netflix screenshot..."):
-                screenshot = get_netflix_screenshot()
-                
-                if screenshot:
-                    st.success("Screenshot captured successfully!")
-                    st.image(screenshot, caption=f"Netflix homepage - {get_indian_datetime()}", use_column_width=True)
-                    
-                    # Add download button for the homepage screenshot
-                    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-                    download_filename = f"netflix_homepage_{timestamp}.png"
-                    download_button_html = get_image_download_button(screenshot, download_filename, "Download Screenshot")
-                    st.markdown(download_button_html, unsafe_allow_html=True)
+            breaker = get_browser_breaker()
+            if breaker.is_open():
+                # Chrome is known to be down, so answer now instead of queueing a doomed capture
+                st.session_state.pop("homepage_job", None)
+                st.warning(f"The browser backend is unavailable; next attempt in {breaker.retry_in():.0f}s.")
+                screenshot, taken = get_fallback_capture()
+                st.image(screenshot.display_data(), caption=f"Netflix homepage - {taken}", use_column_width=True)
+            else:
+                try:
+                    # The capture runs on a background worker; this run only polls it
+                    st.session_state["homepage_job"] = submit_homepage_capture(bypass_cache=bypass_cache)
+                except queue.Full:
+                    st.warning("All capture workers are busy. Please try again in a moment.")
+
+        job_id = st.session_state.get("homepage_job")
+        job = get_capture_worker().get(job_id) if job_id else None
+        if show_capture_job_progress(job):
+            capture_pending = True
+        elif job_id:
+            # Finished jobs are dropped after a while; the result moves to the gallery
+            del st.session_state["homepage_job"]
+            if job is None or job["status"] == "failed":
+                if job is None:
+                    # Pruned after CAPTURE_JOB_TTL, or the worker was restarted
+                    st.error("This capture is no longer available. Please capture the homepage again.")
                 else:
-                    st.error("Failed to capture Netflix screenshot.")
+                    st.error(f"Error taking screenshot: {job['error']}")
+                screenshot, taken = get_fallback_capture()
+                st.image(screenshot.display_data(), caption=f"Netflix homepage - {taken}", use_column_width=True)
+            else:
+                entry, hit = job["result"]
+                show_capture_details(entry, hit)
+                screenshot = entry["result"]
+
+                timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+                item = get_gallery().add(screenshot, "Netflix homepage", f"netflix_homepage_{timestamp}.{screenshot.extension}")
+                open_gallery_item(item["id"])
+                st.success("Screenshot captured successfully! It is open in the gallery below.")
+
+            if screenshot and compare_formats:
+                st.write("Encoder comparison for this screenshot:")
+                st.dataframe(compare_encoders(screenshot))
+            elif not screenshot:
+                st.error("Failed to capture Netflix screenshot.")
     
-    else:  # Login and Capture
+    elif option == "Login and Capture":
         with st.form("netflix_login_form"):
             st.subheader("Netflix Login")
             
@@ -478,39 +2573,163 @@ def main():
                             # Create timestamp for filenames
                             timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
                             
-                            for i, (desc, img) in enumerate(screenshots):
-                                with st.expander(f"{i+1}. {desc}", expanded=True):
-                                    # Display the screenshot
-                                    st.image(img, caption=desc, use_column_width=True)
-                                    
-                                    # Create download button for each screenshot
-                                    sanitized_desc = desc.replace(" ", "_").lower()
-                                    download_filename = f"netflix_{sanitized_desc}_{timestamp}.png"
-                                    download_button_html = get_image_download_button(img, download_filename, f"Download {desc}")
-                                    st.markdown(download_button_html, unsafe_allow_html=True)
+                            # Screenshots go to the gallery, which shows them as thumbnails
+                            archive_files = []
+                            for desc, img in screenshots:
+                                sanitized_desc = desc.replace(" ", "_").lower()
+                                download_filename = f"netflix_{sanitized_desc}_{timestamp}.{img.extension}"
+                                # They show the typed credentials, so they stay in memory only
+                                get_gallery().add(img, desc, download_filename, private=True)
+                                archive_files.append((download_filename, img.data))
+
+                            # Offered only in the run that captured them, the gallery keeps each one
+                            st.download_button(
+                                "Download All Screenshots (ZIP)",
+                                data=build_zip_archive(archive_files),
+                                file_name=f"netflix_screenshots_{timestamp}.zip",
+                                mime="application/zip",
+                            )
                         else:
                             st.error("Failed to capture Netflix login screenshots.")
                     except Exception as e:
                         status_container.empty()
                         st.error(f"Error during screenshot capture process: {str(e)}")
-        
-        # Add option to download all screenshots as a batch
-        if 'screenshots' in locals() and screenshots:
-            st.write("---")
-            st.subheader("Batch Download")
-            st.write("Download all screenshots:")
-            
-            # Create a batch download section with individual buttons
-            cols = st.columns(min(3, len(screenshots)))  # Create up to 3 columns
-            for i, (desc, img) in enumerate(screenshots):
-                sanitized_desc = desc.replace(" ", "_").lower()
-                download_filename = f"netflix_{sanitized_desc}_{timestamp}.png"
-                download_button_html = get_image_download_button(img, download_filename, desc)
-                cols[i % 3].markdown(download_button_html, unsafe_allow_html=True)
+
+    elif option == "Screencast":
+        with st.form("screencast_form"):
+            st.subheader("Screencast")
+            st.write("Records a page for a few seconds, keeping only frames that visibly change.")
+            screencast_url = st.text_input("Page URL", value=NETFLIX_HOME_URL)
+            duration = st.slider("Duration (seconds)", min_value=2, max_value=60, value=int(SCREENCAST_DURATION))
+            output_name = st.selectbox("Output", list(SCREENCAST_OUTPUTS))
+            screencast_submit = st.form_submit_button("Record Screencast")
+
+        if screencast_submit:
+            rejected = check_public_url(screencast_url)
+            if rejected:
+                st.error(f"Only public http(s) pages can be recorded: {rejected}")
+            else:
+                progress = st.progress(0.0, text="Starting browser...")
+
+                def show_progress(stats):
+                    progress.progress(min(1.0, stats["elapsed"] / duration),
+                                      text=f"{stats['kept']} frames kept, {stats['dropped']} near-duplicates dropped")
+
+                try:
+                    recording = record_screencast(screencast_url, output_name, duration, progress=show_progress)
+                except Exception as e:
+                    progress.empty()
+                    st.error(f"Error recording screencast: {e}")
+                else:
+                    progress.progress(1.0, text="Recording finished")
+                    if recording["data"] is None:
+                        st.error("No frames were recorded.")
+                    else:
+                        st.success(f"Kept {recording['kept']} of {recording['received']} frames "
+                                   f"({recording['dropped']} near-duplicates dropped)")
+                        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+                        download_filename = f"screencast_{timestamp}.{recording['extension']}"
+                        if recording["extension"] == "webp":
+                            # Animations are images, so they go to the gallery like any capture
+                            item = get_gallery().add(CaptureResult(data=recording["data"], profile_name="webp"),
+                                                     f"Screencast of {screencast_url}", download_filename)
+                            open_gallery_item(item["id"])
+                        else:
+                            st.download_button("Download Frames (ZIP)", data=recording["data"],
+                                               file_name=download_filename, mime=recording["mime"])
+
+    else:  # Batch Public Capture
+        with st.form("batch_capture_form"):
+            st.subheader("Batch Capture")
+            url_text = st.text_area("Public URLs (one per line)", value=NETFLIX_HOME_URL)
+            preset_names = st.multiselect("Viewports", list(VIEWPORT_PRESETS), default=["Desktop"])
+            batch_submit = st.form_submit_button("Capture Pages")
+
+        if batch_submit:
+            urls = [line.strip() for line in url_text.splitlines() if line.strip()]
+            # Resolved up front so private addresses never reach the browser
+            rejected = [reason for reason in map(check_public_url, urls) if reason]
+            if not urls or not preset_names:
+                st.error("Please provide at least one URL and one viewport.")
+            elif rejected:
+                st.error(f"Only public http(s) pages can be captured: {'; '.join(rejected)}")
+            else:
+                total = len(urls) * len(preset_names)
+                progress = st.progress(0.0, text=f"0/{total} pages captured")
+                timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+                started = time.monotonic()
+                archive_files = []
+
+                # Results are rendered as each capture finishes
+                for done, item in enumerate(capture_public_pages(urls, preset_names), start=1):
+                    progress.progress(done / total, text=f"{done}/{total} pages captured")
+                    label = f"{item['url']} ({item['preset']}) in {item['seconds']:.1f}s"
+                    if item["status"] == "ok":
+                        result = item["result"]
+                        sanitized_url = re.sub(r"[^A-Za-z0-9]+", "_", item["url"].split("://", 1)[1]).strip("_").lower()
+                        download_filename = f"{sanitized_url}_{item['preset'].lower()}_{timestamp}.{result.extension}"
+                        gallery_item = get_gallery().add(result, f"{item['url']} - {item['preset']}", download_filename)
+                        with st.expander(f"✅ {label}"):
+                            st.image(gallery_item["thumbnail"], caption=f"{item['url']} - {item['preset']}")
+                            if result.metadata.get("network"):
+                                st.caption(describe_network(result.metadata["network"], result.metadata["page_load_profile"]))
+                        archive_files.append((download_filename, result.data))
+                    else:
+                        st.error(f"{label} failed: {item['error']}")
+
+                elapsed = time.monotonic() - started
+                # Throughput counts only the pages that were actually captured
+                summary = (f"Captured {len(archive_files)} of {total} pages in {elapsed:.1f}s "
+                           f"({len(archive_files) / elapsed:.2f} pages/s)")
+                if not archive_files:
+                    st.error(summary)
+                elif len(archive_files) < total:
+                    st.warning(summary)
+                else:
+                    st.success(summary)
+                if archive_files:
+                    st.download_button(
+                        "Download All Pages (ZIP)",
+                        data=build_zip_archive(archive_files),
+                        file_name=f"page_captures_{timestamp}.zip",
+                        mime="application/zip",
+                    )
+
+    show_gallery()
 
     # Footer
+    encode_stats = get_encode_stats()
+    if encode_stats:
+        with st.sidebar.expander("Encoder stats"):
+            st.dataframe(encode_stats)
+    with st.sidebar.expander("Capture cache"):
+        st.json(get_capture_cache().summary())
+    with st.sidebar.expander("Capture workers"):
+        st.json(get_capture_worker().summary())
+    breaker_summary = get_browser_breaker().summary()
+    if breaker_summary["state"] != "closed":
+        st.sidebar.warning(f"Browser backend {breaker_summary['state']}: {breaker_summary['last_error']}")
+    with st.sidebar.expander(f"Browser backend ({breaker_summary['state']})"):
+        st.json(breaker_summary)
+    with st.sidebar.expander("Browsers"):
+        st.json(dict(get_browser_supervisor().sample(), pool=get_browser_pool().stats(),
+                     public_pool=get_public_browser_pool().stats()))
+    if TRACING_ENABLED and "histogram" in TRACE_SINKS:
+        # Admin panel over the same registry the Prometheus exporters read
+        with st.sidebar.expander("Capture metrics"):
+            registry = get_metrics_registry()
+            st.dataframe(registry.summary())
+            st.download_button("Download Prometheus metrics", data=registry.render_prometheus(),
+                               file_name="capture_metrics.prom", mime="text/plain")
+
     st.sidebar.markdown("---")
     st.sidebar.info("This tool captures Netflix screenshots with timestamps.")
+    st.sidebar.caption(f"Chromedriver: {resolved_driver['driver_path'] or 'none'} ({resolved_driver['source']})")
+
+    if capture_pending:
+        # Check on the capture again once the rest of the page has rendered
+        time.sleep(CAPTURE_POLL_INTERVAL)
+        st.rerun()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The app is a script, not a package: make it importable as streamlit_app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,101 @@
+import threading
+import time
+
+import streamlit_app as app
+
+
+def make_result(size):
+    return app.CaptureResult(data=b"x" * size, profile_name="png")
+
+
+def test_entries_expire_after_ttl_but_stay_last_good():
+    cache = app.CaptureCache(ttl=60, max_bytes=1000)
+    entry = cache.put("key", make_result(10))
+    assert cache.get("key") is entry
+
+    entry["created"] -= 61
+    assert cache.get("key") is None
+    assert cache.summary()["expired"] == 1
+    assert cache.get_last_good("key") is entry
+
+
+def test_last_good_entries_count_against_the_byte_budget():
+    cache = app.CaptureCache(ttl=60, max_bytes=250)
+    cache.put("stale", make_result(100))["created"] -= 61
+    cache.put("a", make_result(100))
+    cache.get("stale")  # Expired entries are evicted before fresh ones
+    cache.get("a")
+    cache.put("b", make_result(100))
+
+    assert cache.get_last_good("stale") is None
+    assert cache.get("a") is not None
+    assert cache.summary()["bytes"] == 200
+
+
+def test_evicts_least_recently_used_beyond_byte_budget():
+    cache = app.CaptureCache(ttl=60, max_bytes=250)
+    cache.put("a", make_result(100))
+    cache.put("b", make_result(100))
+    cache.get("a")  # "b" is now the least recently used
+    cache.put("c", make_result(100))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.summary()["evictions"] == 1
+    assert cache.summary()["bytes"] == 200
+
+
+def test_keeps_a_single_entry_larger_than_the_budget():
+    cache = app.CaptureCache(ttl=60, max_bytes=10)
+    cache.put("big", make_result(100))
+    assert cache.get("big") is not None
+
+
+def test_reloads_fresh_entries_from_disk(tmp_path):
+    cache = app.CaptureCache(ttl=60, max_bytes=1000, directory=str(tmp_path))
+    cache.put("old", make_result(10))
+    cache.put("new", app.CaptureResult(data=b"payload", profile_name="png", metadata={"url": "https://example.com"}))
+
+    reloaded = app.CaptureCache(ttl=60, max_bytes=1000, directory=str(tmp_path))
+    entry = reloaded.get("new")
+    assert entry["result"].data == b"payload"
+    assert entry["result"].metadata == {"url": "https://example.com"}
+    assert reloaded.summary()["entries"] == 2
+
+
+def test_drops_expired_entries_from_disk(tmp_path):
+    cache = app.CaptureCache(ttl=60, max_bytes=1000, directory=str(tmp_path))
+    cache.put("key", make_result(10))
+
+    reloaded = app.CaptureCache(ttl=0, max_bytes=1000, directory=str(tmp_path))
+    assert reloaded.summary()["entries"] == 0
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_concurrent_misses_share_one_capture():
+    cache = app.CaptureCache(ttl=60, max_bytes=1000)
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def capture():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return make_result(10)
+
+    results = []
+    first = threading.Thread(target=lambda: results.append(cache.get_or_capture("key", capture)))
+    first.start()
+    started.wait(5)
+    second = threading.Thread(target=lambda: results.append(cache.get_or_capture("key", capture)))
+    second.start()
+    time.sleep(0.1)  # Let the second lookup block on the key
+    release.set()
+    first.join()
+    second.join()
+
+    assert len(calls) == 1
+    assert sorted(hit for _, hit in results) == [False, True]
+    assert results[0][0] is results[1][0]
+    assert cache.summary()["coalesced"] == 1
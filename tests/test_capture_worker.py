@@ -0,0 +1,64 @@
+import queue
+import threading
+import time
+
+import pytest
+
+import streamlit_app as app
+
+
+@pytest.fixture
+def worker():
+    worker = app.CaptureWorker(workers=1, queue_size=0)
+    yield worker
+    worker.shutdown()
+
+
+def wait_for_job(worker, job_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = worker.get(job_id)
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_identical_jobs_share_one_id(worker):
+    release = threading.Event()
+    calls = []
+
+    def capture():
+        calls.append(1)
+        release.wait(5)
+        return "result"
+
+    job_id = worker.submit("key", capture)
+    assert worker.submit("key", capture) == job_id
+    release.set()
+
+    job = wait_for_job(worker, job_id)
+    assert job["result"] == "result"
+    assert len(calls) == 1
+
+
+def test_rejects_jobs_beyond_capacity(worker):
+    release = threading.Event()
+    job_id = worker.submit("first", lambda: release.wait(5))
+    with pytest.raises(queue.Full):
+        worker.submit("second", lambda: None)
+    release.set()
+
+    wait_for_job(worker, job_id)
+    # Finished jobs free their slot
+    wait_for_job(worker, worker.submit("second", lambda: None))
+
+
+def test_failed_jobs_report_their_error(worker):
+    def capture():
+        raise RuntimeError("Chrome crashed")
+
+    job = wait_for_job(worker, worker.submit("key", capture))
+    assert job["status"] == "failed"
+    assert job["error"] == "Chrome crashed"
+    assert worker.summary()["failed"] == 1
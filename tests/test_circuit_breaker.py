@@ -0,0 +1,74 @@
+import time
+
+import streamlit_app as app
+
+COOLDOWN = 0.05
+
+
+def make_breaker():
+    return app.CircuitBreaker("test", failure_threshold=2, cooldown=COOLDOWN, max_cooldown=3 * COOLDOWN,
+                              probe_successes=2)
+
+
+def open_breaker(breaker):
+    for _ in range(breaker.failure_threshold):
+        assert breaker.allow_request()
+        breaker.record_failure(RuntimeError("Chrome failed to start"))
+
+
+def test_opens_after_consecutive_failures():
+    breaker = make_breaker()
+    breaker.record_failure(RuntimeError("first"))
+    breaker.record_success()  # A success resets the count
+    breaker.record_failure(RuntimeError("second"))
+    assert breaker.state == "closed"
+
+    breaker.record_failure(RuntimeError("third\nwith a stack trace"))
+    assert breaker.state == "open"
+    assert breaker.is_open()
+    assert not breaker.allow_request()
+    assert breaker.last_error == "third"
+
+
+def test_half_open_allows_one_probe_at_a_time():
+    breaker = make_breaker()
+    open_breaker(breaker)
+    time.sleep(COOLDOWN)
+
+    assert breaker.allow_request()
+    assert breaker.state == "half-open"
+    assert not breaker.allow_request()
+
+    breaker.release_probe()  # An interrupted probe frees the slot
+    assert breaker.allow_request()
+
+
+def test_probes_close_the_breaker_and_reset_the_cooldown():
+    breaker = make_breaker()
+    open_breaker(breaker)
+    time.sleep(COOLDOWN)
+    assert breaker.allow_request()
+    breaker.record_failure(RuntimeError("probe failed"))
+    assert breaker.cooldown == 2 * COOLDOWN
+
+    time.sleep(breaker.cooldown)
+    for _ in range(breaker.probe_successes):
+        assert breaker.allow_request()
+        breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.cooldown == COOLDOWN
+    assert [transition["to"] for transition in breaker.transitions] == [
+        "open", "half-open", "open", "half-open", "closed"]
+
+
+def test_failed_probes_double_the_cooldown_up_to_the_maximum():
+    breaker = make_breaker()
+    open_breaker(breaker)
+    cooldowns = []
+    for _ in range(3):
+        time.sleep(breaker.cooldown)
+        assert breaker.allow_request()
+        breaker.record_failure(RuntimeError("probe failed"))
+        cooldowns.append(breaker.cooldown)
+    assert cooldowns == [2 * COOLDOWN, 3 * COOLDOWN, 3 * COOLDOWN]
+    assert 0 < breaker.retry_in() <= breaker.cooldown
@@ -0,0 +1,49 @@
+from PIL import Image, ImageDraw
+
+import streamlit_app as app
+
+SIZE = (640, 360)
+
+
+def make_page(color=(20, 20, 20), box=None):
+    image = Image.new("RGB", SIZE, color)
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((40, 40, 600, 120), fill=(229, 9, 20))
+    if box:
+        draw.rectangle(box, fill=(255, 255, 255))
+    return image
+
+
+def test_identical_images_hash_alike():
+    assert app.hash_distance(app.perceptual_hash(make_page()), app.perceptual_hash(make_page())) == 0
+    assert len(app.perceptual_hash(make_page())) == app.PERCEPTUAL_HASH_SIZE ** 2 // 4
+
+
+def test_layout_changes_move_the_hash():
+    before = app.fingerprint_image(make_page())
+    after = app.fingerprint_image(make_page(box=(40, 200, 600, 320)))
+    assert app.fingerprint_distance(before, after)[0] > 8
+    assert not app.fingerprints_match(before, after, 8)
+
+
+def test_uniform_colour_changes_are_caught_by_the_mean_colour():
+    red = app.fingerprint_image(Image.new("RGB", SIZE, (255, 0, 0)))
+    black = app.fingerprint_image(Image.new("RGB", SIZE, (0, 0, 0)))
+    # The difference hash alone cannot tell these apart
+    assert app.hash_distance(red["hash"], black["hash"]) == 0
+    assert app.fingerprint_distance(red, black) == (0, 255)
+    assert not app.fingerprints_match(red, black, 8)
+
+
+def test_entries_without_a_colour_compare_by_hash_only():
+    fingerprint = app.fingerprint_image(make_page())
+    assert app.fingerprint_distance(fingerprint, {"hash": fingerprint["hash"]}) == (0, None)
+    assert app.fingerprints_match(fingerprint, {"hash": fingerprint["hash"]}, 0)
+
+
+def test_capture_fingerprints_ignore_the_timestamp_badge():
+    image = make_page()
+    stamped = image.copy()
+    ImageDraw.Draw(stamped).rectangle(app.get_timestamp_overlay_box(*SIZE), fill=(255, 255, 255))
+    assert app.fingerprint_capture(image) == app.fingerprint_capture(stamped)
+    assert app.fingerprint_image(image) != app.fingerprint_image(stamped)
@@ -0,0 +1,130 @@
+import http.client
+import http.server
+import socket
+import threading
+
+import pytest
+
+import streamlit_app as app
+
+
+@pytest.fixture
+def resolve_to(monkeypatch):
+    # Answers every lookup with the given addresses, whatever the host
+    def resolve_to(*addresses):
+        def getaddrinfo(host, port, *args, **kwargs):
+            return [(socket.AF_INET6 if ":" in address else socket.AF_INET, socket.SOCK_STREAM, 6, "", (address, port))
+                    for address in addresses]
+        monkeypatch.setattr(app.socket, "getaddrinfo", getaddrinfo)
+    return resolve_to
+
+
+@pytest.mark.parametrize("address", [
+    "127.0.0.1",  # loopback
+    "::1",
+    "169.254.169.254",  # link-local, cloud metadata
+    "10.0.0.5",
+    "192.168.1.1",
+    "100.64.0.1",  # carrier-grade NAT
+    "0.0.0.0",
+    "fe80::1%eth0",  # scoped link-local IPv6
+    "fd00::1",  # unique local IPv6
+    "::ffff:127.0.0.1",  # IPv4-mapped
+    "::ffff:169.254.169.254",
+    "64:ff9b::a00:1",  # NAT64 of 10.0.0.1
+])
+def test_rejects_non_public_addresses(resolve_to, address):
+    resolve_to(address)
+    assert "non-public address" in app.check_public_url("https://example.com/")
+
+
+def test_accepts_public_addresses(resolve_to):
+    resolve_to("93.184.215.14", "2606:2800:21f:cb07:6820:80da:af6b:8b2c", "::ffff:8.8.8.8")
+    assert app.check_public_url("https://example.com/") is None
+
+
+def test_rejects_a_host_with_any_non_public_address(resolve_to):
+    resolve_to("93.184.215.14", "10.0.0.5")
+    assert "10.0.0.5" in app.check_public_url("https://example.com/")
+
+
+def test_rejects_ip_literals_and_other_schemes():
+    assert app.check_public_url("http://127.0.0.1:8501/") is not None
+    assert app.check_public_url("http://[::1]/") is not None
+    assert "http(s)" in app.check_public_url("file:///etc/passwd")
+    assert "http(s)" in app.check_public_url("ftp://example.com/")
+    assert "not a valid URL" in app.check_public_url("http://example.com:99999/")
+
+
+def test_allowed_hosts_skip_the_check(resolve_to, monkeypatch):
+    resolve_to("10.0.0.5")
+    monkeypatch.setattr(app, "CAPTURE_ALLOWED_HOSTS", ["intranet.example"])
+    assert app.check_public_url("https://Intranet.example/dashboard") is None
+    assert app.check_public_url("https://other.example/") is not None
+    assert app.resolve_public_address("intranet.example.", 443) == ("10.0.0.5", None)
+
+
+class PageHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = f"{self.path} via {self.headers['Host']}".encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def page_server():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), PageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_port
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def proxy():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), app.PublicOnlyProxyHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_port
+    server.shutdown()
+    server.server_close()
+
+
+def proxied_get(proxy, url):
+    connection = http.client.HTTPConnection("127.0.0.1", proxy, timeout=5)
+    try:
+        connection.request("GET", url)
+        response = connection.getresponse()
+        return response.status, response.read().decode()
+    finally:
+        connection.close()
+
+
+def test_proxy_refuses_private_hosts(proxy, page_server):
+    status, body = proxied_get(proxy, f"http://127.0.0.1:{page_server}/secret")
+    assert status == 403
+    assert "secret via" not in body
+
+
+def test_proxy_forwards_to_allowed_hosts(proxy, page_server, monkeypatch):
+    monkeypatch.setattr(app, "CAPTURE_ALLOWED_HOSTS", ["localhost"])
+    assert proxied_get(proxy, f"http://localhost:{page_server}/page?x=1") == (200, f"/page?x=1 via localhost:{page_server}")
+
+
+def test_proxy_checks_connect_tunnels(proxy, page_server, monkeypatch):
+    connection = http.client.HTTPConnection("127.0.0.1", proxy, timeout=5)
+    connection.set_tunnel("169.254.169.254", 80)
+    with pytest.raises(OSError, match="403"):
+        connection.request("GET", "/latest/meta-data/")
+    connection.close()
+
+    monkeypatch.setattr(app, "CAPTURE_ALLOWED_HOSTS", ["localhost"])
+    connection = http.client.HTTPConnection("127.0.0.1", proxy, timeout=5)
+    connection.set_tunnel("localhost", page_server)
+    connection.request("GET", "/tunnelled")
+    assert connection.getresponse().read().decode() == f"/tunnelled via localhost:{page_server}"
+    connection.close()